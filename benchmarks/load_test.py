@@ -0,0 +1,348 @@
+"""Teste de carga offline de /curadoria e /categorize.
+
+Sobe os stubs de LLM e de banco vetorial (benchmarks/stubs.py) e o app via main.py
+apontando para eles, com caches em um diretório temporário, e reenvia os PDFs e .txt do
+acervo com a concorrência pedida. Para cada endpoint relata p50/p95/p99, requisições
+por segundo, erros e o detalhamento por estágio (do cabeçalho Server-Timing), além do
+pico de RSS da árvore de processos do app. O resultado vai para um JSON que pode ser
+comparado com uma execução anterior via --baseline.
+
+O modelo de embeddings é o real (EMBEDDING_MODEL); a primeira requisição de cada
+endpoint serve de aquecimento e fica fora das estatísticas.
+
+Uso: python -m benchmarks.load_test --concurrency 8 --requests 100 --llm-latency-ms 400
+"""
+import os
+import sys
+import json
+import time
+import base64
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import httpx
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    arr = np.asarray(values)
+    return {
+        "p50": round(float(np.percentile(arr, 50)), 2),
+        "p95": round(float(np.percentile(arr, 95)), 2),
+        "p99": round(float(np.percentile(arr, 99)), 2),
+        "mean": round(float(arr.mean()), 2),
+        "max": round(float(arr.max()), 2),
+    }
+
+
+def _parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    timings = {}
+    for part in (header or "").split(","):
+        name, _, rest = part.strip().partition(";dur=")
+        if name and rest:
+            timings[name] = float(rest)
+    return timings
+
+
+def _tree_rss_bytes(root_pid: int) -> int:
+    """Soma o RSS do processo e de todos os descendentes (lido de /proc; só Linux)."""
+    parents: Dict[int, int] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            parents[int(entry)] = int(fields[1])
+        except (OSError, IndexError, ValueError):
+            continue
+
+    tree, frontier = {root_pid}, [root_pid]
+    while frontier:
+        pid = frontier.pop()
+        for child, parent in parents.items():
+            if parent == pid and child not in tree:
+                tree.add(child)
+                frontier.append(child)
+
+    total = 0
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for pid in tree:
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+async def _sample_rss(pid: int, peak: Dict[str, int], interval: float = 0.2) -> None:
+    if not os.path.isdir("/proc"):
+        return
+    while True:
+        peak["bytes"] = max(peak["bytes"], await asyncio.to_thread(_tree_rss_bytes, pid))
+        await asyncio.sleep(interval)
+
+
+def list_documents(directory: str, extensions: List[str]) -> List[str]:
+    paths = [
+        os.path.join(directory, name) for name in sorted(os.listdir(directory))
+        if os.path.splitext(name)[1].lower() in extensions
+    ]
+    return [p for p in paths if os.path.isfile(p)]
+
+
+def _payload(path: str, cache_mode: str) -> bytes:
+    content_type = "text" if path.lower().endswith(".txt") else "pdf"
+    with open(path, "rb") as f:
+        encoded = base64.b64encode(f.read()).decode()
+    return json.dumps({
+        "encoded_content": encoded,
+        "content_type": content_type,
+        "headers": ["Título", "Autores", "Ano", "Palavras-chave", "Resumo"],
+        "cache_mode": cache_mode,
+    }).encode()
+
+
+def _start(cmd: List[str], env: Dict[str, str], log_path: str, cwd: str = ROOT) -> subprocess.Popen:
+    log = open(log_path, "wb")
+    return subprocess.Popen(cmd, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def _wait_ready(client: httpx.AsyncClient, url: str, proc: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Processo terminou antes de ficar pronto ({url}).")
+        try:
+            await client.get(url)
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Tempo esgotado aguardando {url}.")
+
+
+async def run_endpoint(client: httpx.AsyncClient, base_url: str, endpoint: str, documents: List[str],
+                       total: int, concurrency: int, cache_mode: str) -> Dict[str, Any]:
+    # Aquecimento: carrega o modelo de embeddings e os pools antes de medir.
+    await client.post(f"{base_url}/{endpoint}", content=await asyncio.to_thread(_payload, documents[0], cache_mode),
+                      headers={"content-type": "application/json"})
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    statuses: Dict[str, int] = {}
+
+    async def one(i: int) -> None:
+        path = documents[i % len(documents)]
+        async with semaphore:
+            body = await asyncio.to_thread(_payload, path, cache_mode)
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"{base_url}/{endpoint}", content=body,
+                                             headers={"content-type": "application/json"})
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                response, status = None, type(e).__name__
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == "200":
+            latencies.append(elapsed_ms)
+            for stage, ms in _parse_server_timing(response.headers.get("server-timing")).items():
+                if stage != "total":
+                    stages.setdefault(stage, []).append(ms)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(total)])
+    wall = time.perf_counter() - started
+
+    ok = statuses.get("200", 0)
+    return {
+        "requests": total,
+        "ok": ok,
+        "statuses": statuses,
+        "wall_seconds": round(wall, 3),
+        "rps": round(ok / wall, 2) if wall else 0.0,
+        "latency_ms": _percentiles(latencies),
+        "stages_ms": {stage: {**_percentiles(values), "count": len(values)}
+                      for stage, values in sorted(stages.items())},
+    }
+
+
+def _scrape_counters(text: str, prefix: str) -> Dict[str, float]:
+    values = {}
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            name, _, value = line.rpartition(" ")
+            values[name] = float(value)
+    return values
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Dict[str, Optional[float]]]:
+    """Variação percentual de latência e vazão em relação a uma execução anterior."""
+    deltas = {}
+    for endpoint, result in current["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(endpoint)
+        if not previous:
+            continue
+        row = {}
+        for key in ("p50", "p95", "p99"):
+            old, new = previous["latency_ms"][key], result["latency_ms"][key]
+            row[f"{key}_pct"] = round((new - old) / old * 100, 1) if old else None
+        old, new = previous["rps"], result["rps"]
+        row["rps_pct"] = round((new - old) / old * 100, 1) if old else None
+        deltas[endpoint] = row
+    return deltas
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    extensions = [e.strip().lower() for e in args.extensions.split(",") if e.strip()]
+    documents = list_documents(args.documents, extensions)
+    if args.max_documents:
+        documents = documents[:args.max_documents]
+    if not documents:
+        raise SystemExit(f"Nenhum documento em {args.documents} com extensões {extensions}.")
+
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    llm_port, vector_port, app_port = _free_port(), _free_port(), _free_port()
+    # Tudo roda com o workdir como diretório corrente (llm.log e outros caminhos relativos
+    # vão para ele) e os caminhos de estado apontam para lá: o checkout não é alterado.
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "DOCUMENTS_DIR": os.path.join(ROOT, "documents"),
+        "VECTOR_INDEX_DIR": os.path.join(workdir, "vector_index"),
+        "GROQ_API_KEY": "stub",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{llm_port}",
+        "OLLAMA_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "QDRANT_URL": f"http://127.0.0.1:{vector_port}",
+        "QDRANT_API_KEY": "stub",
+        "VECTOR_BACKEND": "qdrant",
+        "TEXT_CACHE_DIR": os.path.join(workdir, "text"),
+        "RESULT_CACHE_DB": os.path.join(workdir, "results.db"),
+        "DEDUP_INDEX_DB": os.path.join(workdir, "dedup.db"),
+        "CLASSIFIER_PATH": args.classifier or os.path.join(workdir, "sem-classificador.json"),
+        "FASTAPI_PORT": str(app_port),
+        "FASTAPI_RELOAD": "false",
+        "METRICS_TIMING_HEADER": "always",
+    }
+
+    procs = [
+        _start([sys.executable, "-m", "benchmarks.stubs", "llm", "--port", str(llm_port),
+                "--latency-ms", str(args.llm_latency_ms), "--jitter-ms", str(args.llm_jitter_ms),
+                "--error-rate", str(args.llm_error_rate)], env, os.path.join(workdir, "stub_llm.log"), workdir),
+        _start([sys.executable, "-m", "benchmarks.stubs", "vector", "--port", str(vector_port),
+                "--points", str(args.vector_points), "--latency-ms", str(args.vector_latency_ms)],
+               env, os.path.join(workdir, "stub_vector.log"), workdir),
+    ]
+    app_proc = _start([sys.executable, os.path.join(ROOT, "main.py")], env, os.path.join(workdir, "app.log"), workdir)
+    procs.append(app_proc)
+    base_url = f"http://127.0.0.1:{app_port}"
+
+    peak = {"bytes": 0}
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    try:
+        async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+            await _wait_ready(client, f"http://127.0.0.1:{llm_port}/stats", procs[0], 30)
+            await _wait_ready(client, f"http://127.0.0.1:{vector_port}/", procs[1], 30)
+            started = time.perf_counter()
+            await _wait_ready(client, f"{base_url}/", app_proc, 120)
+            startup_seconds = time.perf_counter() - started
+
+            sampler = asyncio.create_task(_sample_rss(app_proc.pid, peak))
+            endpoints = {}
+            try:
+                for endpoint in args.endpoints.split(","):
+                    total = args.requests or len(documents)
+                    print(f"{endpoint}: {total} requisições, concorrência {args.concurrency}...", flush=True)
+                    endpoints[endpoint] = await run_endpoint(
+                        client, base_url, endpoint, documents, total, args.concurrency, args.cache_mode)
+            finally:
+                sampler.cancel()
+
+            metrics_text = (await client.get(f"{base_url}/metrics")).text
+            llm_stub = (await client.get(f"http://127.0.0.1:{llm_port}/stats")).json()
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                            capture_output=True, text=True).stdout.strip() or None
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": commit,
+            "python": sys.version.split()[0],
+            "documents": len(documents),
+            "args": vars(args),
+            "workdir": workdir,
+        },
+        "startup_seconds": round(startup_seconds, 3),
+        "peak_rss_bytes": peak["bytes"] or None,
+        "endpoints": endpoints,
+        "llm_tokens": _scrape_counters(metrics_text, "curadoria_llm_tokens_total"),
+        "llm_stub": llm_stub,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga offline do serviço de curadoria.")
+    parser.add_argument("--documents", default=os.path.join(ROOT, "documents", "aprovados"))
+    parser.add_argument("--extensions", default=".pdf,.txt")
+    parser.add_argument("--max-documents", type=int, default=0)
+    parser.add_argument("--endpoints", default="curadoria,categorize")
+    parser.add_argument("--requests", type=int, default=0, help="por endpoint; 0 = um por documento")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cache-mode", default="bypass", choices=["use", "refresh", "bypass"])
+    parser.add_argument("--classifier", default=None, help="classificador local a usar em /categorize")
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--vector-latency-ms", type=float, default=5.0)
+    parser.add_argument("--vector-points", type=int, default=5000)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None, help="JSON de uma execução anterior para comparação")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["vs_baseline"] = compare(report, json.load(f))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for endpoint, result in report["endpoints"].items():
+        lat = result["latency_ms"]
+        print(f"{endpoint}: {result['ok']}/{result['requests']} ok, {result['rps']} req/s, "
+              f"p50 {lat['p50']} ms, p95 {lat['p95']} ms, p99 {lat['p99']} ms")
+    if report["peak_rss_bytes"]:
+        print(f"Pico de RSS: {report['peak_rss_bytes'] / 1024 / 1024:.1f} MB")
+    if "vs_baseline" in report:
+        print(json.dumps(report["vs_baseline"], indent=2))
+    print(f"Resultado salvo em {output}")
@@ -0,0 +1,170 @@
+"""Compara os tokens de entrada dos prompts antes e depois do prompt_builder no acervo.
+
+"Antes" é o prompt de sistema completo com o esquema e document_text[:6000]; "depois" é
+o prompt compilado por (categoria, colunas) com os trechos escolhidos por seção dentro
+do orçamento. Os tokens são estimados (~4 caracteres por token), igual para os dois lados.
+Também relata quais seções (resumo, métodos, resultados, conclusões) chegam à LLM em
+cada caso, como indicativo de cobertura do conteúdo que o esquema pede.
+
+Uso: python -m benchmarks.prompt_tokens --documents documents/aprovados --output prompt_tokens.json
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.extraction import extract_document_text_from_path
+from src.utils.prompt_builder import (
+    categorizacao_document_text,
+    compiled_system_prompt,
+    curadoria_document_text,
+    detect_sections,
+    estimate_tokens,
+)
+from src.utils.prompts import (
+    CATEGORIZACAO_SYSTEM_PROMPT,
+    CATEGORIZACAO_USER_PROMPT,
+    CURADORIA_TOKEN_BUDGET,
+    CURADORIA_USER_PROMPT,
+    curadoria_system_template,
+)
+from src.utils.text_cache import TextCache, file_content_hash
+
+# Colunas preenchidas pela curadoria na planilha consolidada.
+DEFAULT_HEADERS = [
+    "Autor(es)", "Titulo", "Subtítulo", "Ano", "Palavras-chave", "Resumo", "Tipo de documento",
+    "Título do periódico", "Caracteristicas do solo e região (escrever)", "ferramentas e técnicas (seleção)",
+    "nutrientes (seleção)", "estratégias de fornecimento de nutrientes (seleção)", "grupos de culturas (seleção)",
+    "culturas presentes (seleção)", "FEEDBACK DO CURADOR (escrever)", "APROVAÇÃO CURADOR (marcar)",
+]
+LEGACY_CHARS = 6000
+CONTENT_SECTIONS = ("abstract", "methods", "results", "conclusions")
+
+
+def _extract(path: str) -> Tuple[str, str]:
+    content_type = "text" if path.lower().endswith(".txt") else "pdf"
+    try:
+        return path, extract_document_text_from_path(path, content_type)
+    except Exception:
+        return path, ""
+
+
+def load_texts(paths: List[str], workers: int) -> Dict[str, str]:
+    """Textos do acervo, reaproveitando o cache de texto do app quando possível."""
+    cache = TextCache()
+    texts, missing = {}, []
+    for path in paths:
+        content_type = "text" if path.lower().endswith(".txt") else "pdf"
+        cached = cache.get(file_content_hash(path, content_type))
+        if cached is None:
+            missing.append(path)
+        else:
+            texts[path] = cached
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, text in pool.map(_extract, missing):
+            content_type = "text" if path.lower().endswith(".txt") else "pdf"
+            cache.put(file_content_hash(path, content_type), text)
+            texts[path] = text
+    return texts
+
+
+def _sections_in(text: str, full_text: str) -> set:
+    """Seções do documento cujo início aparece no trecho enviado."""
+    found = set()
+    for start, section in detect_sections(full_text):
+        probe = full_text[start:start + 80]
+        if probe and probe in text:
+            found.add(section)
+    return found
+
+
+def _legacy_sections(full_text: str) -> set:
+    return {section for start, section in detect_sections(full_text) if start < LEGACY_CHARS}
+
+
+def measure(text: str, headers: List[str], category: Optional[str]) -> Dict[str, object]:
+    skeleton = json.dumps({header: "" for header in headers}, indent=2)
+    old_system = curadoria_system_template(category).format(schema_str=skeleton)
+    old_user = CURADORIA_USER_PROMPT.format(contexto_ref="", document_text=text[:LEGACY_CHARS])
+    new_system = compiled_system_prompt(category, tuple(headers))
+    selected = curadoria_document_text(text, headers)
+    new_user = CURADORIA_USER_PROMPT.format(contexto_ref="", document_text=selected)
+
+    old_cat = CATEGORIZACAO_SYSTEM_PROMPT + CATEGORIZACAO_USER_PROMPT.format(document_text=text[:LEGACY_CHARS])
+    new_cat = CATEGORIZACAO_SYSTEM_PROMPT + CATEGORIZACAO_USER_PROMPT.format(
+        document_text=categorizacao_document_text(text))
+
+    return {
+        "curadoria_old": estimate_tokens(old_system) + estimate_tokens(old_user),
+        "curadoria_new": estimate_tokens(new_system) + estimate_tokens(new_user),
+        "system_old": estimate_tokens(old_system),
+        "system_new": estimate_tokens(new_system),
+        "categorize_old": estimate_tokens(old_cat),
+        "categorize_new": estimate_tokens(new_cat),
+        "sections_old": _legacy_sections(text) & set(CONTENT_SECTIONS),
+        "sections_new": _sections_in(selected, text) & set(CONTENT_SECTIONS),
+        "sections_doc": {section for _, section in detect_sections(text)} & set(CONTENT_SECTIONS),
+        "over_budget": len(text) > CURADORIA_TOKEN_BUDGET * 4,
+    }
+
+
+def summarize(rows: List[Dict[str, object]]) -> Dict[str, object]:
+    def total(key: str) -> int:
+        return sum(row[key] for row in rows)
+
+    report: Dict[str, object] = {"documents": len(rows)}
+    for name in ("curadoria", "categorize", "system"):
+        old, new = total(f"{name}_old"), total(f"{name}_new")
+        report[name] = {
+            "tokens_old": old,
+            "tokens_new": new,
+            "saved": old - new,
+            "saved_pct": round((old - new) / old * 100, 1) if old else 0.0,
+            "mean_old": round(old / len(rows), 1) if rows else 0.0,
+            "mean_new": round(new / len(rows), 1) if rows else 0.0,
+        }
+
+    long_rows = [row for row in rows if row["over_budget"]]
+    coverage = {}
+    for section in CONTENT_SECTIONS:
+        present = [row for row in long_rows if section in row["sections_doc"]]
+        coverage[section] = {
+            "documents_with_section": len(present),
+            "sent_before": sum(section in row["sections_old"] for row in present),
+            "sent_after": sum(section in row["sections_new"] for row in present),
+        }
+    report["section_coverage_over_budget_documents"] = {"documents": len(long_rows), **coverage}
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tokens economizados pelo prompt_builder no acervo.")
+    parser.add_argument("--documents", default=os.path.join("documents", "aprovados"))
+    parser.add_argument("--extensions", default=".pdf,.txt")
+    parser.add_argument("--headers", default=None, help="lista JSON de colunas; padrão: colunas da curadoria")
+    parser.add_argument("--category", default="solos")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    logging.getLogger("pypdf").setLevel(logging.ERROR)
+
+    extensions = [e.strip().lower() for e in args.extensions.split(",") if e.strip()]
+    paths = [os.path.join(args.documents, name) for name in sorted(os.listdir(args.documents))
+             if os.path.splitext(name)[1].lower() in extensions]
+    headers = json.loads(args.headers) if args.headers else DEFAULT_HEADERS
+
+    texts = load_texts(paths, args.workers)
+    rows = [measure(texts[path], headers, args.category) for path in paths if len(texts.get(path, "")) >= 150]
+    report = summarize(rows)
+    report["category"] = args.category
+    report["token_budget"] = CURADORIA_TOKEN_BUDGET
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
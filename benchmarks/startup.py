@@ -0,0 +1,229 @@
+"""Mede o cold start e a memória por worker do serviço de curadoria.
+
+Para cada cenário (modo de startup e número de workers) sobe o app via main.py contra os
+stubs de LLM e de banco vetorial e mede: tempo até /health/live e até /health/ready
+(em todos os workers), latência do primeiro /curadoria e do seguinte e a memória de cada
+processo (RSS, PSS e parte compartilhada, de /proc/<pid>/smaps_rollup). Com vários
+workers, a soma do PSS mostra quanto o modelo carregado antes do fork é compartilhado.
+Também mede o tempo de `import src.utils.llm` isolado.
+
+Uso: python -m benchmarks.startup --scenarios lazy:1,warm:1,warm:4
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Any, Dict
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from benchmarks.load_test import RESULTS_DIR, _free_port, _parse_server_timing, _payload, _start, _wait_ready
+from src.utils.startup import process_memory
+
+
+def _parents() -> Dict[int, int]:
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    return parents
+
+
+def process_tree_memory(root_pid: int, workers: int) -> Dict[str, Any]:
+    """Memória do processo raiz e descendentes, com o papel de cada um."""
+    parents = _parents()
+    rows = []
+
+    def visit(pid: int, depth: int) -> None:
+        if depth == 0:
+            role = "master" if workers > 1 else "worker"
+        elif depth == 1 and workers > 1:
+            role = "worker"
+        else:
+            role = "extracao"
+        rows.append({"pid": pid, "role": role, **process_memory(pid)})
+        for child, parent in parents.items():
+            if parent == pid:
+                visit(child, depth + 1)
+
+    visit(root_pid, 0)
+    totals = {key: round(sum(row.get(key, 0.0) for row in rows), 1) for key in ("rss_mb", "pss_mb")}
+    worker_rows = [row for row in rows if row["role"] == "worker"]
+    return {
+        "processes": rows,
+        "total_rss_mb": totals["rss_mb"],
+        "total_pss_mb": totals["pss_mb"],
+        "worker_rss_mb": [row.get("rss_mb") for row in worker_rows],
+        "worker_private_mb": [row.get("private_mb") for row in worker_rows],
+    }
+
+
+def import_seconds(env: Dict[str, str], workdir: str) -> float:
+    code = "import time; t = time.perf_counter(); import src.utils.llm; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env, capture_output=True, text=True)
+    return round(float(out.stdout.strip().splitlines()[-1]), 3)
+
+
+async def _poll(client: httpx.AsyncClient, url: str, proc: subprocess.Popen, timeout: float) -> httpx.Response:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"App terminou antes de responder em {url}.")
+        try:
+            # Conexão nova a cada tentativa, para o accept cair em workers diferentes.
+            response = await client.get(url, headers={"Connection": "close"})
+            if response.status_code == 200:
+                return response
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.05)
+    raise RuntimeError(f"Tempo esgotado aguardando {url}.")
+
+
+async def run_scenario(mode: str, workers: int, env: Dict[str, str], workdir: str, document: str,
+                       timeout: float) -> Dict[str, Any]:
+    port = _free_port()
+    name = f"{mode}-{workers}"
+    scenario_dir = os.path.join(workdir, name)
+    os.makedirs(scenario_dir, exist_ok=True)
+    env = {
+        **env,
+        "STARTUP_MODE": mode,
+        "FASTAPI_WORKERS": str(workers),
+        "FASTAPI_PORT": str(port),
+        "TEXT_CACHE_DIR": os.path.join(scenario_dir, "text"),
+        "RESULT_CACHE_DB": os.path.join(scenario_dir, "results.db"),
+        "DEDUP_INDEX_DB": os.path.join(scenario_dir, "dedup.db"),
+    }
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    proc = _start([sys.executable, os.path.join(ROOT, "main.py")], env, os.path.join(workdir, f"{name}.log"),
+                  scenario_dir)
+    try:
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            await _poll(client, f"{base_url}/health/live", proc, timeout)
+            live_seconds = time.perf_counter() - started
+
+            # Cada worker responde por si; espera até ver todos prontos.
+            ready_pids = set()
+            deadline = time.monotonic() + timeout
+            while len(ready_pids) < workers and time.monotonic() < deadline:
+                ready_pids.add((await _poll(client, f"{base_url}/health/ready", proc, timeout)).json()["pid"])
+            ready_seconds = time.perf_counter() - started
+            memory_ready = process_tree_memory(proc.pid, workers)
+
+            latencies, timings = [], []
+            for _ in range(2):
+                t = time.perf_counter()
+                response = await client.post(f"{base_url}/curadoria", content=_payload(document, "bypass"),
+                                             headers={"Content-Type": "application/json"})
+                latencies.append(round((time.perf_counter() - t) * 1000, 1))
+                response.raise_for_status()
+                timings.append(_parse_server_timing(response.headers.get("server-timing")))
+            readiness = (await client.get(f"{base_url}/health/ready")).json()
+            memory_after = process_tree_memory(proc.pid, workers)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "live_seconds": round(live_seconds, 3),
+        "ready_seconds": round(ready_seconds, 3),
+        "first_request_ms": latencies[0],
+        "second_request_ms": latencies[1],
+        "first_request_stages_ms": timings[0],
+        "warmup_seconds": readiness.get("warmup_seconds"),
+        "memory_ready": memory_ready,
+        "memory_after_requests": memory_after,
+    }
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="startup-")
+    llm_port, vector_port = _free_port(), _free_port()
+    # Como no load_test: os processos rodam a partir do workdir (llm.log e outros caminhos
+    # relativos vão para lá) e o checkout não é alterado.
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "DOCUMENTS_DIR": os.path.join(ROOT, "documents"),
+        "GROQ_API_KEY": "stub",
+        "GROQ_BASE_URL": f"http://127.0.0.1:{llm_port}",
+        "OLLAMA_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "QDRANT_URL": f"http://127.0.0.1:{vector_port}",
+        "QDRANT_API_KEY": "stub",
+        "VECTOR_BACKEND": "qdrant",
+        "CLASSIFIER_PATH": os.path.join(workdir, "sem-classificador.json"),
+        "FASTAPI_RELOAD": "false",
+        "METRICS_TIMING_HEADER": "always",
+    }
+    stubs = [
+        _start([sys.executable, "-m", "benchmarks.stubs", "llm", "--port", str(llm_port), "--latency-ms", "50"],
+               env, os.path.join(workdir, "stub_llm.log"), workdir),
+        _start([sys.executable, "-m", "benchmarks.stubs", "vector", "--port", str(vector_port)],
+               env, os.path.join(workdir, "stub_vector.log"), workdir),
+    ]
+    scenarios = []
+    try:
+        async with httpx.AsyncClient() as client:
+            await _wait_ready(client, f"http://127.0.0.1:{llm_port}/stats", stubs[0], 30)
+            await _wait_ready(client, f"http://127.0.0.1:{vector_port}/", stubs[1], 30)
+        for spec in args.scenarios.split(","):
+            mode, _, workers = spec.strip().partition(":")
+            print(f"Cenário {mode} com {workers or 1} worker(s)...", flush=True)
+            scenarios.append(await run_scenario(mode, int(workers or 1), env, workdir, args.document, args.timeout))
+    finally:
+        for proc in stubs:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                            capture_output=True, text=True).stdout.strip() or None
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": commit,
+            "python": sys.version.split()[0],
+            "cpus": os.cpu_count(),
+            "embedding_model": os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"),
+            "args": vars(args),
+            "workdir": workdir,
+        },
+        "import_seconds": import_seconds(env, workdir),
+        "scenarios": scenarios,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold start e memória por worker do serviço de curadoria.")
+    parser.add_argument("--scenarios", default="lazy:1,warm:1,warm:4", help="modo:workers separados por vírgula")
+    parser.add_argument("--document", default=os.path.join(ROOT, "documents", "aprovados",
+                                                           "Boaretto(2023) - Zinc fertilizers (1).pdf"))
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    output = args.output or os.path.join(RESULTS_DIR, f"startup_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps({k: v for k, v in report.items() if k != "meta"}, ensure_ascii=False, indent=2))
+    print(f"Relatório salvo em {output}")
@@ -0,0 +1,153 @@
+"""Servidores locais que substituem a Groq e o Qdrant nos benchmarks.
+
+- llm: API de chat compatível com OpenAI/Groq (/openai/v1/chat/completions e
+  /v1/chat/completions), com latência configurável e respostas fixas: o JSON do esquema
+  pedido no prompt de curadoria ou uma categoria no prompt de categorização.
+- vector: coleção em memória que responde ao endpoint de consulta do Qdrant
+  (/collections/{nome}/points/query) com busca exata sobre vetores sintéticos.
+
+Uso: python -m benchmarks.stubs llm --port 9101 --latency-ms 400 --jitter-ms 150
+     python -m benchmarks.stubs vector --port 9102 --points 5000
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCHEMA_RE = re.compile(r"\{[^{}]*\}", re.S)
+
+
+def _canned_curadoria(system_prompt: str) -> Dict[str, Any]:
+    """Preenche o esqueleto JSON que o prompt de curadoria envia à LLM."""
+    for match in SCHEMA_RE.finditer(system_prompt):
+        try:
+            skeleton = json.loads(match.group(0))
+        except json.JSONDecodeError:
+            continue
+        if isinstance(skeleton, dict) and skeleton:
+            answer = {key: "valor de teste" for key in skeleton}
+            answer["APROVAÇÃO CURADOR (marcar)"] = True
+            answer["FEEDBACK DO CURADOR (escrever)"] = "Aprovado (resposta do stub)."
+            return answer
+    return {"APROVAÇÃO CURADOR (marcar)": True, "FEEDBACK DO CURADOR (escrever)": "Aprovado (resposta do stub)."}
+
+
+def build_llm_app(latency_ms: float, jitter_ms: float, error_rate: float, seed: int = 0) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0}
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        await asyncio.sleep(max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000.0)
+        if error_rate and rng.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": {"message": "rate limited (stub)"}}, status_code=429,
+                                headers={"retry-after": "1"})
+
+        messages = body.get("messages", [])
+        system_prompt = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            content = json.dumps(_canned_curadoria(system_prompt), ensure_ascii=False)
+        else:
+            content = rng.choice(["solos", "citros e cana"])
+
+        prompt_tokens = prompt_chars // 4
+        completion_tokens = max(1, len(content) // 4)
+        return {
+            "id": f"stub-{stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    app.add_api_route("/openai/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/stats", lambda: stats, methods=["GET"])
+    return app
+
+
+def build_vector_app(points: int, latency_ms: float, seed: int = 0) -> FastAPI:
+    app = FastAPI()
+    rng = np.random.default_rng(seed)
+    state: Dict[str, Optional[np.ndarray]] = {"matrix": None}
+    payloads: List[Dict[str, str]] = [
+        {"text": f"Fato científico sintético {i}: a adubação potássica alterou a produtividade em {i % 37}%."}
+        for i in range(points)
+    ]
+
+    def _matrix(dim: int) -> np.ndarray:
+        # A dimensão só é conhecida na primeira consulta (depende do modelo de embeddings).
+        matrix = state["matrix"]
+        if matrix is None or matrix.shape[1] != dim:
+            matrix = rng.standard_normal((points, dim)).astype(np.float32)
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+            state["matrix"] = matrix
+        return matrix
+
+    @app.get("/")
+    def root():
+        return {"title": "qdrant - vector search engine (stub)", "version": "1.12.0"}
+
+    @app.post("/collections/{collection}/points/query")
+    async def query(collection: str, request: Request):
+        started = time.perf_counter()
+        body = await request.json()
+        query = body.get("query") or []
+        # Clientes recentes enviam {"nearest": [...]} em vez do vetor puro.
+        if isinstance(query, dict):
+            query = query.get("nearest") or []
+        vector = np.asarray(query, dtype=np.float32)
+        limit = int(body.get("limit") or 10)
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000.0)
+        scores = _matrix(len(vector)) @ (vector / max(float(np.linalg.norm(vector)), 1e-12))
+        top = np.argpartition(-scores, min(limit, points - 1))[:limit]
+        top = top[np.argsort(-scores[top])]
+        return {
+            "result": {"points": [
+                {"id": int(i), "version": 0, "score": float(scores[i]), "payload": payloads[i]} for i in top
+            ]},
+            "status": "ok",
+            "time": time.perf_counter() - started,
+        }
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stubs locais de LLM e banco vetorial para benchmarks.")
+    parser.add_argument("kind", choices=["llm", "vector"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--latency-ms", type=float, default=None)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de respostas 429 (só llm)")
+    parser.add_argument("--points", type=int, default=5000, help="vetores na coleção (só vector)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.kind == "llm":
+        latency = 400.0 if args.latency_ms is None else args.latency_ms
+        stub = build_llm_app(latency, args.jitter_ms, args.error_rate, args.seed)
+    else:
+        latency = 0.0 if args.latency_ms is None else args.latency_ms
+        stub = build_vector_app(args.points, latency, args.seed)
+    uvicorn.run(stub, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,83 @@
+"""Compara o pico de memória do caminho JSON/base64 com o upload em streaming.
+
+Uso: python -m benchmarks.upload_memory "documents/aprovados/arquivo.pdf"
+"""
+import os
+import sys
+import json
+import base64
+import asyncio
+import tracemalloc
+from pydantic import BaseModel
+from typing import List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.extraction import decode_document, extract_document_text, extract_document_text_from_path
+from src.utils.uploads import UPLOAD_CHUNK_SIZE, spool_chunks
+
+
+class PDFPayload(BaseModel):
+    encoded_content: str
+    content_type: str
+    headers: List[str]
+    category: Optional[str] = None
+
+
+def json_path(body: bytes) -> int:
+    payload = PDFPayload.model_validate_json(body)
+    data = decode_document(payload.encoded_content, payload.content_type)
+    return len(extract_document_text(data, payload.content_type))
+
+
+async def _file_chunks(path: str):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def upload_path(path: str) -> int:
+    upload = asyncio.run(spool_chunks(_file_chunks(path), "pdf"))
+    try:
+        return len(extract_document_text_from_path(upload.path, "pdf"))
+    finally:
+        upload.cleanup()
+
+
+def measure(fn, *args) -> int:
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main(paths: List[str]) -> None:
+    results = []
+    for path in paths:
+        with open(path, "rb") as f:
+            encoded = base64.b64encode(f.read()).decode()
+        body = json.dumps({"encoded_content": encoded, "content_type": "pdf", "headers": []}).encode()
+        del encoded
+
+        # O corpo JSON já existe antes da requisição chegar ao handler; mede apenas o processamento.
+        json_peak = measure(json_path, body) + len(body)
+        del body
+        upload_peak = measure(upload_path, path)
+        results.append({
+            "file": os.path.basename(path),
+            "size_bytes": os.path.getsize(path),
+            "json_peak_bytes": json_peak,
+            "upload_peak_bytes": upload_peak,
+        })
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    main(sys.argv[1:])
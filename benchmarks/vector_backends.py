@@ -0,0 +1,120 @@
+"""Compara recall e latência do índice vetorial local (float32/int8) com o Qdrant.
+
+O gabarito é a busca exata em float32 sobre os mesmos embeddings. O Qdrant só é medido
+quando QDRANT_URL/QDRANT_API_KEY estão definidos e a coleção contém o mesmo acervo
+(os resultados são comparados pelo campo "text" do payload).
+
+Uso: python -m benchmarks.vector_backends --index .cache/vector_index --queries 200 --k 3
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from typing import Dict, List
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.vector_index import VECTOR_INDEX_DIR, LocalVectorIndex, _normalize
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 3) if values else 0.0
+
+
+def _summary(name: str, latencies: List[float], recalls: List[float]) -> Dict[str, float]:
+    return {
+        "backend": name,
+        "recall": round(float(np.mean(recalls)), 4) if recalls else None,
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+    }
+
+
+def _load_exact(index: LocalVectorIndex) -> np.ndarray:
+    matrix = np.asarray(index._matrix, dtype=np.float32)
+    if index._scales is not None:
+        matrix = matrix * np.asarray(index._scales)[:, None]
+    return _normalize(matrix)
+
+
+def _int8_copy(index: LocalVectorIndex, directory: str) -> LocalVectorIndex:
+    copy = LocalVectorIndex(directory, "int8")
+    copy.append(_load_exact(index), index._payloads, model=index.model)
+    return copy
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", default=VECTOR_INDEX_DIR)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Arquivo JSON para gravar o resultado.")
+    args = parser.parse_args()
+
+    index = LocalVectorIndex(args.index)
+    if not len(index):
+        print(f"Índice vazio em {args.index}; rode 'python -m src.utils.vector_index' antes.")
+        sys.exit(1)
+
+    from sentence_transformers import SentenceTransformer
+    encoder = SentenceTransformer(index.model or "all-MiniLM-L6-v2")
+
+    # Consultas: trechos do próprio acervo, deslocados para não coincidir com os chunks indexados.
+    rng = random.Random(args.seed)
+    texts = []
+    for payload in rng.sample(index._payloads, min(args.queries, len(index))):
+        text = payload["text"]
+        start = rng.randint(0, max(0, len(text) // 3))
+        texts.append(text[start:start + 500])
+    queries = _normalize(encoder.encode(texts, convert_to_numpy=True))
+
+    # Compara pelo texto do trecho: cópias idênticas de um documento contam como o mesmo acerto.
+    exact = _load_exact(index)
+    truth = [{index._payloads[i]["text"] for i in np.argsort(-(exact @ q))[:args.k]} for q in queries]
+
+    backends = {f"local-{index.dtype}": index}
+    tmp_dir = None
+    if index.dtype == "float32":
+        tmp_dir = tempfile.TemporaryDirectory()
+        backends["local-int8"] = _int8_copy(index, tmp_dir.name)
+
+    results = []
+    for name, backend in backends.items():
+        latencies, recalls = [], []
+        for q, expected in zip(queries, truth):
+            started = time.perf_counter()
+            hits = backend.search(q, args.k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            found = {p["text"] for _, p in hits}
+            recalls.append(len(found & expected) / len(expected))
+        results.append(_summary(name, latencies, recalls))
+
+    if os.getenv("QDRANT_URL") and os.getenv("QDRANT_API_KEY"):
+        from qdrant_client import QdrantClient
+        client = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"))
+        latencies, recalls = [], []
+        for q, expected in zip(queries, truth):
+            started = time.perf_counter()
+            response = client.query_points(collection_name="BaseCurador", query=q.tolist(), limit=args.k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            found = {hit.payload.get("text") for hit in response.points}
+            recalls.append(len(found & expected) / len(expected))
+        results.append(_summary("qdrant", latencies, recalls))
+
+    report = {"vectors": len(index), "dim": index.dim, "queries": len(queries), "k": args.k, "results": results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if tmp_dir:
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
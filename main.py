@@ -1,4 +1,3 @@
-from src.utils.llm import app
 import uvicorn
 import os
 import sys
@@ -6,7 +5,20 @@ import sys
 # Adiciona o diretório atual ao path para garantir que src.utils.llm seja encontrado
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Os processos do pool de extração (forkserver/spawn) reexecutam este arquivo como
+# __mp_main__; eles só usam src.utils.extraction e não devem carregar o app.
+if __name__ != "__mp_main__":
+    from src.utils.llm import app
+
 if __name__ == "__main__":
     # Esta configuração permite rodar o FastAPI diretamente: python main.py
     port = int(os.getenv("FASTAPI_PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
+    workers = int(os.getenv("FASTAPI_WORKERS", 1))
+    if workers > 1:
+        # Produção com vários workers: SDKs e modelo carregados uma vez e compartilhados após o fork.
+        from src.utils.llm import after_fork, preload
+        from src.utils.prefork import serve
+        serve(app, host="0.0.0.0", port=port, workers=workers, preload=preload, after_fork=after_fork)
+    else:
+        reload = os.getenv("FASTAPI_RELOAD", "true").lower() == "true"
+        uvicorn.run("main:app", host="0.0.0.0", port=port, reload=reload)
@@ -685,15 +685,19 @@ app.get("/api/llm-logs", authenticateToken, async (req, res) => {
 app.listen(port, "0.0.0.0", () => {
   // Start the local LLM server (FastAPI) in background
   console.log("Iniciando servidor LLM local (FastAPI)...");
-  const venvUvicorn = path.join(__dirname, 'venv', 'bin', 'uvicorn');
-  const uvicornCmd = fsSync.existsSync(venvUvicorn) ? venvUvicorn : 'uvicorn';
+  const venvPython = path.join(__dirname, 'venv', 'bin', 'python');
+  const pythonCmd = fsSync.existsSync(venvPython) ? venvPython : 'python3';
   
-  console.log(`Usando comando uvicorn: ${uvicornCmd}`);
+  console.log(`Usando comando python: ${pythonCmd}`);
     
-  // Alterado para usar o main.py da raiz conforme solicitado
-  const llmServer = spawn(uvicornCmd, ['main:app', '--host', '0.0.0.0', '--port', '8000'], {
+  // main.py sem reload; STARTUP_MODE (lazy/warm) segue o padrão do lado Python se não for definido
+  const llmServer = spawn(pythonCmd, ['main.py'], {
     stdio: 'inherit',
-    env: process.env,
+    env: {
+      ...process.env,
+      FASTAPI_PORT: '8000',
+      FASTAPI_RELOAD: 'false',
+    },
     shell: true
   });
 
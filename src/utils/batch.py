@@ -0,0 +1,90 @@
+import os
+import json
+import fnmatch
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Variáveis de Ambiente
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 4))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 16))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", 3))
+DOCUMENTS_DIR = os.path.abspath(os.getenv("DOCUMENTS_DIR", "documents"))
+
+
+def resolve_document_path(path: str) -> str:
+    """Resolve um caminho relativo a DOCUMENTS_DIR, recusando caminhos fora dele."""
+    candidate = path if os.path.isabs(path) else os.path.join(DOCUMENTS_DIR, path)
+    resolved = os.path.realpath(candidate)
+    if os.path.commonpath([resolved, os.path.realpath(DOCUMENTS_DIR)]) != os.path.realpath(DOCUMENTS_DIR):
+        raise HTTPException(status_code=400, detail=f"Caminho fora do diretório de documentos: {path}")
+    if not os.path.isfile(resolved):
+        raise HTTPException(status_code=404, detail=f"Arquivo não encontrado: {path}")
+    return resolved
+
+
+def list_document_paths(directory: str, pattern: str = "*.pdf") -> List[str]:
+    """Lista os arquivos de um subdiretório de DOCUMENTS_DIR que casam com o padrão."""
+    root = os.path.realpath(os.path.join(DOCUMENTS_DIR, directory))
+    if os.path.commonpath([root, os.path.realpath(DOCUMENTS_DIR)]) != os.path.realpath(DOCUMENTS_DIR) or not os.path.isdir(root):
+        raise HTTPException(status_code=400, detail=f"Diretório inválido: {directory}")
+    names = sorted(fnmatch.filter(os.listdir(root), pattern))
+    return [os.path.join(directory, name) for name in names if os.path.isfile(os.path.join(root, name))]
+
+
+def content_type_for_path(path: str) -> str:
+    return "text" if path.lower().endswith(".txt") else "pdf"
+
+
+async def _run_with_retries(worker: Callable[[Any], Awaitable[Any]], item: Any) -> Any:
+    """Repete o item quando o serviço sinaliza sobrecarga (429/503), respeitando o Retry-After."""
+    attempt = 0
+    while True:
+        try:
+            return await worker(item)
+        except HTTPException as e:
+            if e.status_code not in (429, 503) or attempt >= BATCH_MAX_RETRIES:
+                raise
+            attempt += 1
+            retry_after = float((e.headers or {}).get("Retry-After", 2 ** attempt))
+            await asyncio.sleep(retry_after)
+
+
+async def stream_batch(items: List[Any], worker: Callable[[Any], Awaitable[Any]],
+                       item_id: Callable[[int, Any], Optional[str]],
+                       concurrency: Optional[int] = None) -> AsyncIterator[str]:
+    """Processa os itens em paralelo e gera uma linha NDJSON por item, na ordem de conclusão.
+
+    Falhas são reportadas por item e não interrompem o lote.
+    """
+    limit = max(1, min(concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(index: int, item: Any) -> dict:
+        async with semaphore:
+            started = time.perf_counter()
+            line = {"index": index, "id": item_id(index, item)}
+            try:
+                result = await _run_with_retries(worker, item)
+                line.update(status="ok", result=result)
+            except HTTPException as e:
+                line.update(status="error", status_code=e.status_code, detail=e.detail)
+            except Exception as e:
+                logger.error(f"Erro no item {index} do lote: {e}")
+                line.update(status="error", status_code=500, detail=str(e))
+            line["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            return line
+
+    tasks = [asyncio.create_task(run(i, item)) for i, item in enumerate(items)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            line = await finished
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+    finally:
+        # Cliente desconectou ou o stream foi interrompido: não deixa tarefas órfãs.
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,283 @@
+import os
+import sys
+import json
+import logging
+import argparse
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Variáveis de Ambiente
+CLASSIFIER_PATH = os.getenv("CLASSIFIER_PATH", os.path.join(".cache", "classifier.json"))
+CLASSIFIER_THRESHOLD = float(os.getenv("CLASSIFIER_THRESHOLD", 0.8))
+# Recall mínimo, em cada categoria, das respostas locais (confiança >= limiar) na validação
+# leave-one-out do treino para o classificador dispensar a LLM. Com as classes desbalanceadas,
+# a acurácia geral esconde erros na categoria minoritária.
+CLASSIFIER_MIN_RECALL = float(os.getenv("CLASSIFIER_MIN_RECALL", 0.95))
+
+CATEGORIES = ("solos", "citros e cana")
+
+# Trecho do documento usado na classificação, dividido em janelas do tamanho que o
+# all-MiniLM-L6-v2 consegue ler (~256 tokens).
+CLASSIFIER_CHARS = 3000
+CLASSIFIER_WINDOW = 1000
+
+
+class Prediction(NamedTuple):
+    category: str
+    confidence: float
+    scores: Dict[str, float]
+
+
+def document_windows(text: str) -> List[str]:
+    text = text[:CLASSIFIER_CHARS]
+    return [text[i:i + CLASSIFIER_WINDOW] for i in range(0, len(text), CLASSIFIER_WINDOW)] or [""]
+
+
+def pool_embeddings(vectors: np.ndarray) -> np.ndarray:
+    """Média das janelas normalizadas, renormalizada: um vetor por documento."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    mean = vectors.mean(axis=0)
+    return mean / max(float(np.linalg.norm(mean)), 1e-12)
+
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+class CentroidClassifier:
+    """Classificador por centróides de embeddings, com confiança calibrada por temperatura.
+
+    Cada categoria é representada pela média dos embeddings dos seus documentos; a
+    confiança é o softmax das similaridades de cosseno dividido pela temperatura
+    ajustada no treino.
+    """
+
+    def __init__(self, labels: List[str], centroids: np.ndarray, temperature: float, model: str,
+                 trained_on: int = 0, evaluation: Optional[Dict[str, Any]] = None):
+        self.labels = list(labels)
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.temperature = temperature
+        self.model = model
+        self.trained_on = trained_on
+        # Resumo da validação leave-one-out feita no treino (ver `evaluate`).
+        self.evaluation = evaluation
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, labels: List[str], model: str) -> "CentroidClassifier":
+        classes = sorted(set(labels))
+        y = np.array([classes.index(label) for label in labels])
+        centroids = np.stack([pool_embeddings(vectors[y == i]) for i in range(len(classes))])
+        sims = vectors @ centroids.T
+
+        # Temperatura que minimiza a log-loss nos próprios dados de treino.
+        best_t, best_loss = 0.05, float("inf")
+        for t in np.geomspace(0.005, 1.0, 60):
+            probs = _softmax(sims / t)[np.arange(len(y)), y]
+            loss = -float(np.mean(np.log(np.maximum(probs, 1e-12))))
+            if loss < best_loss:
+                best_t, best_loss = float(t), loss
+        return cls(classes, centroids, best_t, model, trained_on=len(labels))
+
+    def predict(self, vector: np.ndarray) -> Prediction:
+        sims = self.centroids @ np.asarray(vector, dtype=np.float32)
+        probs = _softmax(sims / self.temperature)
+        best = int(np.argmax(probs))
+        return Prediction(
+            self.labels[best],
+            round(float(probs[best]), 4),
+            {label: round(float(p), 4) for label, p in zip(self.labels, probs)},
+        )
+
+    def bypass_check(self, threshold: float = CLASSIFIER_THRESHOLD,
+                     min_recall: float = CLASSIFIER_MIN_RECALL) -> Tuple[bool, str]:
+        """Se a validação do treino permite responder sem a LLM acima de `threshold`, e o motivo."""
+        if not self.evaluation:
+            return False, "classificador salvo sem avaliação; rode 'python -m src.utils.classifier train'"
+        if threshold < self.evaluation["threshold"]:
+            return False, f"limiar {threshold} abaixo do avaliado no treino ({self.evaluation['threshold']})"
+        recalls = self.evaluation["local_recall"]
+        # Categoria sem nenhuma resposta local na validação conta como não verificada.
+        failing = {label: recall for label, recall in recalls.items() if recall is None or recall < min_recall}
+        if failing:
+            return False, f"recall local abaixo de {min_recall} (ou sem respostas locais) em {failing}"
+        return True, f"recall local por categoria {recalls}"
+
+    def save(self, path: str = CLASSIFIER_PATH) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "labels": self.labels,
+                "centroids": self.centroids.tolist(),
+                "temperature": self.temperature,
+                "model": self.model,
+                "trained_on": self.trained_on,
+                "evaluation": self.evaluation,
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str = CLASSIFIER_PATH) -> Optional["CentroidClassifier"]:
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["labels"], np.array(data["centroids"]), data["temperature"], data["model"],
+                   data.get("trained_on", 0), data.get("evaluation"))
+
+
+# --- DADOS ROTULADOS E LINHA DE COMANDO ---
+
+def load_labeled_documents(spreadsheet: str, documents_dir: str) -> List[Tuple[str, str, str]]:
+    """Lê (id, texto, categoria) da planilha consolidada.
+
+    O texto vem do PDF listado em 'URL DO DOCUMENTO' quando ele existe em documents_dir
+    e tem texto extraível; senão, de título, palavras-chave e resumo da própria planilha.
+    """
+    import openpyxl
+    from src.utils.extraction import extract_document_text_from_path
+    from src.utils.text_cache import TextCache, file_content_hash
+
+    text_cache = TextCache()
+    workbook = openpyxl.load_workbook(spreadsheet, read_only=True)
+    rows = workbook.worksheets[0].iter_rows(values_only=True)
+    header = list(next(rows))
+    col = {name: header.index(name) for name in header if name}
+
+    documents = []
+    for row in rows:
+        category = str(row[col["CATEGORIA"]] or "").strip().lower()
+        if category not in CATEGORIES:
+            continue
+
+        text = ""
+        filename = row[col["URL DO DOCUMENTO"]]
+        path = os.path.join(documents_dir, str(filename)) if filename else None
+        if path and os.path.isfile(path):
+            content_type = "text" if path.lower().endswith(".txt") else "pdf"
+            try:
+                key = file_content_hash(path, content_type)
+                text = text_cache.get(key)
+                if text is None:
+                    text = extract_document_text_from_path(path, content_type)
+                    text_cache.put(key, text)
+            except Exception as e:
+                logger.warning(f"Falha ao extrair {filename}: {e}")
+                text = ""
+        if len(text) < 100:
+            text = " ".join(str(row[col[name]] or "") for name in ("Titulo", "Palavras-chave", "Resumo"))
+        documents.append((str(row[col["ID"]] or filename), text, category))
+    return documents
+
+
+def _embed_documents(texts: List[str], model_name: str) -> np.ndarray:
+    from sentence_transformers import SentenceTransformer
+
+    encoder = SentenceTransformer(model_name)
+    windows = [document_windows(text) for text in texts]
+    flat = encoder.encode([w for ws in windows for w in ws], batch_size=64, convert_to_numpy=True)
+    vectors, start = [], 0
+    for ws in windows:
+        vectors.append(pool_embeddings(flat[start:start + len(ws)]))
+        start += len(ws)
+    return np.stack(vectors)
+
+
+def _recall(pairs: List[Tuple[str, str]], label: str) -> Optional[float]:
+    """Fração dos documentos da categoria `label` previstos corretamente (None sem documentos)."""
+    predicted = [p for p, t in pairs if t == label]
+    return round(sum(p == label for p in predicted) / len(predicted), 4) if predicted else None
+
+
+def _balanced(recalls: Dict[str, Optional[float]]) -> Optional[float]:
+    values = [r for r in recalls.values() if r is not None]
+    return round(sum(values) / len(values), 4) if values else None
+
+
+def evaluate(vectors: np.ndarray, labels: List[str], model: str, threshold: float) -> Dict[str, Any]:
+    """Validação leave-one-out: recall por categoria, acurácia balanceada e a linha de base
+    da classe majoritária, no geral e na fração respondida localmente (confiança >= limiar).
+
+    Com as categorias desbalanceadas, responder sempre a majoritária já dá uma acurácia
+    alta; por isso a decisão de dispensar a LLM olha o recall de cada categoria.
+    """
+    predictions, majority = [], []
+    for i in range(len(labels)):
+        mask = np.arange(len(labels)) != i
+        train_labels = [label for j, label in enumerate(labels) if j != i]
+        if len(set(train_labels)) < 2:
+            continue
+        clf = CentroidClassifier.fit(vectors[mask], train_labels, model)
+        predictions.append((clf.predict(vectors[i]), labels[i]))
+        majority.append((max(set(train_labels), key=train_labels.count), labels[i]))
+
+    classes = sorted(set(labels))
+    confusion: Dict[str, Dict[str, int]] = {}
+    for pred, truth in predictions:
+        confusion.setdefault(truth, {}).setdefault(pred.category, 0)
+        confusion[truth][pred.category] += 1
+
+    pairs = [(p.category, t) for p, t in predictions]
+    confident = [(p.category, t) for p, t in predictions if p.confidence >= threshold]
+    recall = {label: _recall(pairs, label) for label in classes}
+    local_recall = {label: _recall(confident, label) for label in classes}
+    majority_recall = {label: _recall(majority, label) for label in classes}
+
+    def accuracy(items: List[Tuple[str, str]]) -> Optional[float]:
+        return round(sum(p == t for p, t in items) / len(items), 4) if items else None
+
+    return {
+        "documents": len(labels),
+        "support": {label: labels.count(label) for label in classes},
+        "accuracy": accuracy(pairs),
+        "balanced_accuracy": _balanced(recall),
+        "recall": recall,
+        "majority_baseline": {"accuracy": accuracy(majority), "balanced_accuracy": _balanced(majority_recall)},
+        "threshold": threshold,
+        "local_coverage": round(len(confident) / len(predictions), 4) if predictions else None,
+        "local_coverage_by_class": {
+            label: round(sum(t == label for _, t in confident) / max(1, sum(t == label for _, t in pairs)), 4)
+            for label in classes
+        },
+        "local_accuracy": accuracy(confident),
+        "local_balanced_accuracy": _balanced(local_recall),
+        "local_recall": local_recall,
+        "llm_fallback_rate": round(1 - len(confident) / len(predictions), 4) if predictions else None,
+        "confusion": confusion,
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Treina e avalia o classificador local de categorias.")
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("--spreadsheet", default="Consolidado - Respostas Gerais.xlsx")
+    parser.add_argument("--documents", default=os.path.join("documents", "aprovados"))
+    parser.add_argument("--output", default=CLASSIFIER_PATH)
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+    parser.add_argument("--threshold", type=float, default=CLASSIFIER_THRESHOLD)
+    args = parser.parse_args()
+
+    documents = load_labeled_documents(args.spreadsheet, args.documents)
+    if len({category for _, _, category in documents}) < 2:
+        print("São necessários documentos rotulados de ao menos duas categorias.")
+        sys.exit(1)
+    labels = [category for _, _, category in documents]
+    vectors = _embed_documents([text for _, text, _ in documents], args.model)
+
+    evaluation = evaluate(vectors, labels, args.model, args.threshold)
+    if args.command == "train":
+        # A avaliação vai junto com os centróides: o app só dispensa a LLM se ela passar.
+        clf = CentroidClassifier.fit(vectors, labels, args.model)
+        clf.evaluation = evaluation
+        clf.save(args.output)
+        bypass, reason = clf.bypass_check(args.threshold)
+        print(json.dumps({"saved": args.output, "labels": clf.labels, "temperature": clf.temperature,
+                          "trained_on": clf.trained_on, "llm_bypass": bypass, "reason": reason,
+                          "evaluation": evaluation}, ensure_ascii=False, indent=2))
+    else:
+        print(json.dumps(evaluation, ensure_ascii=False, indent=2))
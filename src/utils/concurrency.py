@@ -0,0 +1,166 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+from fastapi import HTTPException
+from src.utils.metrics import record_stage
+
+logger = logging.getLogger(__name__)
+
+# Variáveis de Ambiente
+EXTRACTION_POOL = os.getenv("EXTRACTION_POOL", "process")  # 'process' ou 'thread'
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", min(4, os.cpu_count() or 1)))
+# Os processos de extração não podem ser fork do app: o pai tem threads (event loop, pools,
+# tokenizer) e um fork pode herdar locks travados. 'forkserver' ou 'spawn'.
+EXTRACTION_START_METHOD = os.getenv(
+    "EXTRACTION_START_METHOD", "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", 2))
+
+MAX_CONCURRENT_EXTRACTIONS = int(os.getenv("MAX_CONCURRENT_EXTRACTIONS", EXTRACTION_WORKERS))
+MAX_CONCURRENT_VECTOR_SEARCHES = int(os.getenv("MAX_CONCURRENT_VECTOR_SEARCHES", 8))
+MAX_CONCURRENT_LLM_CALLS = int(os.getenv("MAX_CONCURRENT_LLM_CALLS", 8))
+
+MAX_QUEUED_PER_STAGE = int(os.getenv("MAX_QUEUED_PER_STAGE", 32))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("QUEUE_TIMEOUT_SECONDS", 30))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", 5))
+
+
+class StageLimiter:
+    """Limita a concorrência de um estágio do pipeline e aplica backpressure.
+
+    Até `max_concurrency` tarefas rodam ao mesmo tempo e até `max_waiting` aguardam
+    na fila. Além disso a requisição é recusada com 429; se a espera passar de
+    `timeout` segundos, com 503. Ambas as respostas trazem o cabeçalho Retry-After.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_waiting: int = MAX_QUEUED_PER_STAGE,
+                 timeout: float = QUEUE_TIMEOUT_SECONDS, retry_after: int = RETRY_AFTER_SECONDS):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.waiting = 0
+        self.in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _refuse(self, status_code: int, detail: str) -> HTTPException:
+        return HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.in_flight + self.waiting >= self.max_concurrency + self.max_waiting:
+            self.rejected += 1
+            logger.warning(f"Fila do estágio '{self.name}' cheia ({self.waiting} aguardando).")
+            raise self._refuse(429, f"Serviço sobrecarregado: fila do estágio '{self.name}' cheia.")
+
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning(f"Tempo de espera esgotado no estágio '{self.name}'.")
+            raise self._refuse(503, f"Serviço indisponível: tempo de espera esgotado no estágio '{self.name}'.")
+        finally:
+            self.waiting -= 1
+            record_stage(f"fila_{self.name}", time.perf_counter() - started)
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+class ProcessLocalExecutor(Executor):
+    """Pool criado no primeiro uso dentro de cada processo.
+
+    Workers pré-forkados herdariam as filas e threads de um pool criado no processo
+    pai; aqui cada processo monta o seu quando precisa.
+    """
+
+    def __init__(self, factory: Callable[[], Executor]):
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _get(self) -> Executor:
+        pid = os.getpid()
+        if self._executor is None or self._pid != pid:
+            with self._lock:
+                if self._executor is None or self._pid != pid:
+                    self._executor = self._factory()
+                    self._pid = pid
+        return self._executor
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        return self._get().submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+            self._executor = None
+
+
+def _build_extraction_executor() -> Executor:
+    if EXTRACTION_POOL == "thread":
+        return ThreadPoolExecutor(max_workers=EXTRACTION_WORKERS, thread_name_prefix="extraction")
+    context = multiprocessing.get_context(EXTRACTION_START_METHOD)
+    if EXTRACTION_START_METHOD == "forkserver":
+        # O servidor de fork importa só a extração: sem o __main__, que traria o app inteiro
+        # (log, caches em SQLite, classificador, clientes) para ele e para cada processo do pool.
+        context.set_forkserver_preload(["src.utils.extraction"])
+    return ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS, mp_context=context)
+
+
+extraction_executor = ProcessLocalExecutor(_build_extraction_executor)
+embedding_executor = ProcessLocalExecutor(
+    lambda: ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS, thread_name_prefix="embedding")
+)
+
+extraction_limiter = StageLimiter("extracao", MAX_CONCURRENT_EXTRACTIONS)
+vector_search_limiter = StageLimiter("busca_vetorial", MAX_CONCURRENT_VECTOR_SEARCHES)
+llm_limiter = StageLimiter("llm", MAX_CONCURRENT_LLM_CALLS)
+
+STAGE_LIMITERS = [extraction_limiter, vector_search_limiter, llm_limiter]
+
+
+async def run_in_executor(executor: Executor, fn: Callable[..., Any], *args: Any) -> Any:
+    """Executa uma função síncrona no pool indicado sem bloquear o event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, fn, *args)
+
+
+def concurrency_stats() -> Dict[str, Dict[str, int]]:
+    return {limiter.name: limiter.stats() for limiter in STAGE_LIMITERS}
+
+
+def shutdown_executors() -> None:
+    # Espera os processos de extração saírem: workers pré-forkados terminam com os._exit,
+    # que não passa pela limpeza do interpretador e deixaria esses processos órfãos.
+    extraction_executor.shutdown(wait=True, cancel_futures=True)
+    embedding_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,340 @@
+import os
+import re
+import sys
+import glob
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import argparse
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Variáveis de Ambiente
+DEDUP_INDEX_DB = os.getenv("DEDUP_INDEX_DB", os.path.join(".cache", "dedup.db"))
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.85))  # Jaccard estimada mínima entre os textos
+
+# Assinatura MinHash de 128 permutações dividida em 32 faixas de 4 linhas: pares com
+# Jaccard acima de ~0,45 já caem na mesma faixa com alta probabilidade; o limiar real é
+# conferido na assinatura completa.
+NUM_PERM = 128
+BANDS = 32
+SHINGLE_WORDS = 5
+SHINGLE_CHUNK = 4096
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+WORD_RE = re.compile(r"\w+")
+# Sufixo que navegadores e sistemas de arquivos põem em cópias: "artigo (1).pdf", "artigo(2).pdf".
+COPY_SUFFIX_RE = re.compile(r"\s*\(\d+\)$")
+
+# Conexões herdadas do processo pai em workers pré-forkados (nunca fechadas no filho).
+_INHERITED_CONNECTIONS: List[sqlite3.Connection] = []
+
+# Funções de hash multiply-shift ((a·x + b) mod 2^64, 32 bits altos) com sementes fixas:
+# assinaturas gravadas continuam comparáveis entre execuções. Sem módulo por primo, a
+# assinatura de um artigo inteiro sai em poucos milissegundos.
+_rng = np.random.RandomState(1)
+_PERM_A = (_rng.randint(0, 1 << 63, size=NUM_PERM, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+_PERM_B = _rng.randint(0, 1 << 63, size=NUM_PERM, dtype=np.uint64)
+_SHIFT = np.uint64(32)
+
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    """Hashes de 32 bits dos shingles de SHINGLE_WORDS palavras do texto normalizado."""
+    words = WORD_RE.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    word_hashes = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in words), dtype=np.uint64, count=len(words))
+    if len(words) < SHINGLE_WORDS:
+        return np.unique(word_hashes)
+    # Hash polinomial das janelas de palavras, combinado de forma vetorizada.
+    count = len(words) - SHINGLE_WORDS + 1
+    combined = np.zeros(count, dtype=np.uint64)
+    for k in range(SHINGLE_WORDS):
+        combined = (combined * np.uint64(1000003) + word_hashes[k:k + count]) & MAX_HASH
+    return np.unique(combined)
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """Assinatura MinHash do texto limpo; None quando não há palavras."""
+    hashes = _shingle_hashes(text)
+    if not len(hashes):
+        return None
+    signature = np.full(NUM_PERM, MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(hashes), SHINGLE_CHUNK):
+        block = hashes[start:start + SHINGLE_CHUNK]
+        permuted = (_PERM_A[:, None] * block[None, :] + _PERM_B[:, None]) >> _SHIFT
+        np.minimum(signature, permuted.min(axis=1), out=signature)
+    return signature
+
+
+def estimate_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Jaccard estimada: fração de posições iguais nas assinaturas."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def _band_keys(signature: np.ndarray) -> List[bytes]:
+    rows = NUM_PERM // BANDS
+    return [signature[i * rows:(i + 1) * rows].tobytes() for i in range(BANDS)]
+
+
+class DuplicateMatch(NamedTuple):
+    document_hash: str
+    source: Optional[str]
+    similarity: float
+
+
+class LSHBuckets:
+    """Faixas LSH em memória: cada faixa da assinatura aponta para os documentos que a compartilham."""
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self._buckets: List[Dict[bytes, List[str]]] = [defaultdict(list) for _ in range(BANDS)]
+        self._signatures: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, document_hash: str) -> bool:
+        return document_hash in self._signatures
+
+    def add(self, document_hash: str, signature: np.ndarray) -> bool:
+        if document_hash in self._signatures:
+            return False
+        self._signatures[document_hash] = signature
+        for band, key in enumerate(_band_keys(signature)):
+            self._buckets[band][key].append(document_hash)
+        return True
+
+    def query(self, signature: np.ndarray, exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Documentos com Jaccard estimada acima do limiar, do mais parecido ao menos."""
+        candidates = set()
+        for band, key in enumerate(_band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+        candidates.discard(exclude)
+        matches = [(doc, estimate_similarity(signature, self._signatures[doc])) for doc in candidates]
+        return sorted((m for m in matches if m[1] >= self.threshold), key=lambda m: -m[1])
+
+
+class DuplicateIndex:
+    """Índice de quase-duplicatas dos documentos já curados (MinHash + LSH).
+
+    As assinaturas ficam em SQLite e as faixas LSH em memória, reconstruídas na
+    abertura; documentos entram no índice à medida que são curados. A consulta só
+    toca as faixas da assinatura e os candidatos que colidem nelas.
+    """
+
+    def __init__(self, path: Optional[str] = DEDUP_INDEX_DB, threshold: float = DEDUP_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lsh = LSHBuckets(threshold)
+        self._sources: Dict[str, Optional[str]] = {}
+        self.lookups = 0
+        self.duplicates = 0
+        self.lookup_seconds = 0.0
+        self._last_rowid = 0
+        self._connect()
+
+    def _connect(self) -> None:
+        if self.path:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS fingerprints (
+                        document_hash TEXT PRIMARY KEY,
+                        source TEXT,
+                        signature BLOB NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                """)
+                self._conn.commit()
+                self._load()
+            except sqlite3.Error as e:
+                logger.error(f"Erro ao abrir índice de duplicatas: {e}")
+                self._conn = None
+
+    def _load(self) -> None:
+        """Traz para as faixas em memória as assinaturas gravadas desde a última leitura,
+        inclusive as de outros workers que compartilham o arquivo."""
+        skipped = 0
+        for rowid, document_hash, source, blob in self._conn.execute(
+            "SELECT rowid, document_hash, source, signature FROM fingerprints WHERE rowid > ? ORDER BY rowid",
+            (self._last_rowid,),
+        ):
+            self._last_rowid = rowid
+            signature = np.frombuffer(blob, dtype=np.uint64)
+            if len(signature) != NUM_PERM:
+                skipped += 1
+                continue
+            self._lsh.add(document_hash, signature)
+            self._sources[document_hash] = source
+        if skipped:
+            logger.warning(f"Índice de duplicatas: {skipped} assinaturas com formato antigo ignoradas.")
+
+    def reopen(self) -> None:
+        """Abre uma conexão própria após um fork; as faixas já carregadas são mantidas."""
+        if self._conn is not None:
+            _INHERITED_CONNECTIONS.append(self._conn)
+        self._conn = None
+        self._lock = threading.Lock()
+        self._connect()
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def __len__(self) -> int:
+        return len(self._lsh)
+
+    def find(self, document_hash: str, signature: np.ndarray) -> List[DuplicateMatch]:
+        """Quase-duplicatas já indexadas, da mais parecida à menos (exclui o próprio documento)."""
+        started = time.perf_counter()
+        with self._lock:
+            if self._conn:
+                self._load()
+            matches = [DuplicateMatch(doc, self._sources.get(doc), similarity)
+                       for doc, similarity in self._lsh.query(signature, exclude=document_hash)]
+            self.lookups += 1
+            self.lookup_seconds += time.perf_counter() - started
+        return matches
+
+    def add(self, document_hash: str, signature: np.ndarray, source: Optional[str] = None) -> None:
+        if not self._conn:
+            return
+        with self._lock:
+            if not self._lsh.add(document_hash, signature):
+                return
+            self._sources[document_hash] = source
+            self._conn.execute(
+                "INSERT OR IGNORE INTO fingerprints VALUES (?, ?, ?, ?)",
+                (document_hash, source, signature.tobytes(), time.time()),
+            )
+            self._conn.commit()
+
+    def record_duplicate(self) -> None:
+        with self._lock:
+            self.duplicates += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "documents": len(self),
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "duplicates": self.duplicates,
+            "mean_lookup_ms": round(self.lookup_seconds / self.lookups * 1000, 4) if self.lookups else 0.0,
+        }
+
+
+# --- RELATÓRIO OFFLINE ---
+
+def _file_signature(path: str) -> Tuple[str, Optional[np.ndarray]]:
+    from src.utils.extraction import extract_document_text_from_path
+
+    content_type = "text" if path.lower().endswith(".txt") else "pdf"
+    try:
+        return path, minhash_signature(extract_document_text_from_path(path, content_type))
+    except Exception as e:
+        logger.warning(f"Falha ao ler {path}: {e}")
+        return path, None
+
+
+def _original_rank(path: str) -> Tuple[bool, float, str]:
+    """Ordem para escolher o original do grupo: nome sem sufixo de cópia, arquivo mais antigo, nome."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = float("inf")
+    return bool(COPY_SUFFIX_RE.search(stem)), mtime, path
+
+
+def find_clusters(signatures: Dict[str, np.ndarray], threshold: float = DEDUP_THRESHOLD) -> List[Dict[str, Any]]:
+    """Agrupa documentos cuja Jaccard estimada passa do limiar (componentes conexos)."""
+    lsh = LSHBuckets(threshold)
+    parent = {name: name for name in signatures}
+
+    def root(name: str) -> str:
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    for name, signature in signatures.items():
+        for other, _ in lsh.query(signature):
+            parent[root(name)] = root(other)
+        lsh.add(name, signature)
+
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for name in signatures:
+        groups[root(name)].append(name)
+
+    clusters = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=_original_rank)
+        original = members[0]
+        clusters.append({
+            "original": original,
+            "duplicates": [
+                {"path": m, "similarity": round(estimate_similarity(signatures[original], signatures[m]), 3)}
+                for m in members[1:]
+            ],
+        })
+    return sorted(clusters, key=lambda c: (-len(c["duplicates"]), c["original"]))
+
+
+def report_duplicates(source_dir: str, patterns: List[str], threshold: float = DEDUP_THRESHOLD,
+                      workers: Optional[int] = None) -> Dict[str, Any]:
+    paths = sorted({p for pattern in patterns for p in glob.glob(os.path.join(source_dir, pattern))})
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        signatures = {path: sig for path, sig in pool.map(_file_signature, paths, chunksize=4) if sig is not None}
+    fingerprint_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    clusters = find_clusters(signatures, threshold)
+    cluster_seconds = time.perf_counter() - started
+    return {
+        "documents": len(paths),
+        "fingerprinted": len(signatures),
+        "threshold": threshold,
+        "clusters": len(clusters),
+        "redundant_documents": sum(len(c["duplicates"]) for c in clusters),
+        "fingerprint_seconds": round(fingerprint_seconds, 2),
+        "cluster_seconds": round(cluster_seconds, 4),
+        "groups": clusters,
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logging.getLogger("pypdf").setLevel(logging.ERROR)
+    parser = argparse.ArgumentParser(description="Relata grupos de documentos quase duplicados no acervo.")
+    parser.add_argument("--source", default=os.path.join("documents", "aprovados"))
+    parser.add_argument("--pattern", default="*.pdf,*.txt", help="padrões glob separados por vírgula")
+    parser.add_argument("--threshold", type=float, default=DEDUP_THRESHOLD)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    report = report_duplicates(args.source, [p.strip() for p in args.pattern.split(",") if p.strip()],
+                               args.threshold, args.workers)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    sys.exit(0)
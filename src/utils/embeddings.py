@@ -0,0 +1,192 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from fastapi import HTTPException
+from src.utils.concurrency import RETRY_AFTER_SECONDS, embedding_executor, run_in_executor
+
+logger = logging.getLogger(__name__)
+
+# Variáveis de Ambiente
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", 32))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", 10))
+EMBEDDING_MAX_QUEUE = int(os.getenv("EMBEDDING_MAX_QUEUE", 256))
+EMBEDDING_CONCURRENT_BATCHES = int(os.getenv("EMBEDDING_CONCURRENT_BATCHES", os.getenv("EMBEDDING_WORKERS", 2)))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 4096))
+
+
+class EmbeddingService:
+    """Serviço de embeddings com carga preguiçosa do modelo e micro-batching.
+
+    Pedidos concorrentes de `encode` entram em uma fila e são agrupados em lotes de até
+    `max_batch_size` textos ou `max_wait_ms` de espera, o que rende mais no
+    sentence-transformers do que codificar um texto por vez. Resultados ficam em um
+    cache LRU indexado pelo hash do texto.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE,
+                 max_wait_ms: float = EMBEDDING_MAX_WAIT_MS, max_queue: int = EMBEDDING_MAX_QUEUE,
+                 concurrent_batches: int = EMBEDDING_CONCURRENT_BATCHES, cache_size: int = EMBEDDING_CACHE_SIZE):
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.concurrent_batches = concurrent_batches
+        self.cache_size = cache_size
+
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._batch_tasks: set = set()
+
+        self.requests = 0
+        self.cache_hits = 0
+        self.rejected = 0
+        self.batches = 0
+        self.encoded_texts = 0
+        self.batch_sizes: Counter = Counter()
+        self.encode_seconds = 0.0
+
+    # --- modelo ---
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def _get_model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    started = time.perf_counter()
+                    self._model = SentenceTransformer(self.model_name)
+                    self.load_seconds = round(time.perf_counter() - started, 3)
+                    logger.info(f"Modelo de embeddings '{self.model_name}' carregado em {self.load_seconds}s")
+        return self._model
+
+    def load(self) -> None:
+        """Carrega o modelo sem codificar nada (seguro antes do fork dos workers)."""
+        self._get_model()
+
+    def warm_up(self) -> None:
+        """Carrega o modelo e roda uma codificação de teste antes do primeiro pedido."""
+        self._get_model().encode(["warm-up"], convert_to_numpy=True)
+
+    def encode_batch_sync(self, texts: List[str]) -> np.ndarray:
+        return self._get_model().encode(texts, batch_size=self.max_batch_size, convert_to_numpy=True)
+
+    # --- fila e micro-batching ---
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.concurrent_batches)
+            self._pending = {}
+            self._worker = loop.create_task(self._collect())
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._cache[key] = vector
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def encode(self, text: str) -> np.ndarray:
+        self.requests += 1
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+        vector = self._cache.get(key)
+        if vector is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return vector
+
+        self._ensure_worker()
+        future = self._pending.get(key)
+        if future is None:
+            if self._queue.qsize() >= self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=429,
+                    detail="Serviço sobrecarregado: fila de embeddings cheia.",
+                    headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+                )
+            future = self._loop.create_future()
+            self._pending[key] = future
+            self._queue.put_nowait((key, text))
+        return await asyncio.shield(future)
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[Tuple[str, str]] = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._slots.acquire()
+            task = loop.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, str]]) -> None:
+        keys = [key for key, _ in batch]
+        try:
+            started = time.perf_counter()
+            vectors = await run_in_executor(embedding_executor, self.encode_batch_sync, [text for _, text in batch])
+            self.encode_seconds += time.perf_counter() - started
+            self.batches += 1
+            self.encoded_texts += len(batch)
+            self.batch_sizes[len(batch)] += 1
+
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+                future = self._pending.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_result(vector)
+        except Exception as e:
+            logger.error(f"Erro ao gerar embeddings: {e}")
+            for key in keys:
+                future = self._pending.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "loaded": self.loaded,
+            "load_seconds": self.load_seconds,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "pending": len(self._pending),
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "cache_entries": len(self._cache),
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "encoded_texts": self.encoded_texts,
+            "avg_batch_size": round(self.encoded_texts / self.batches, 2) if self.batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "avg_batch_ms": round(self.encode_seconds * 1000 / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,79 @@
+import io
+import re
+import time
+import base64
+from typing import NamedTuple, Tuple
+from pypdf import PdfReader
+
+# Funções de extração isoladas do app para poderem rodar em um pool de processos
+# sem carregar os clientes de LLM e o modelo de embeddings.
+
+def clean_text_for_llm(text: str) -> str:
+    """Limpa ruídos de PDF e normaliza o texto para o LLM."""
+    if not text:
+        return ""
+    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'(Page \d+ of \d+|Página \d+ de \d+)', '', text, flags=re.IGNORECASE)
+    return text.strip()
+
+def decode_document(encoded_content: str, content_type: str) -> bytes:
+    """Decodifica o conteúdo base64 recebido no payload."""
+    if content_type == 'pdf' and "," in encoded_content:
+        encoded_content = encoded_content.split(",")[1]
+    return base64.b64decode(encoded_content)
+
+class ExtractionResult(NamedTuple):
+    text: str
+    pages: int
+    read_seconds: float
+    clean_seconds: float
+
+
+def _read_pdf_text(stream) -> Tuple[str, int]:
+    """Lê as primeiras páginas do PDF; o pypdf só carrega os objetos das páginas acessadas."""
+    reader = PdfReader(stream)
+
+    raw_text = ""
+    max_pages = min(len(reader.pages), 10)
+
+    for i in range(max_pages):
+        page_text = reader.pages[i].extract_text()
+        if page_text:
+            raw_text += page_text + "\n"
+
+    return raw_text, max_pages
+
+def _read_and_clean(read, content_type: str) -> ExtractionResult:
+    """Roda a leitura e a limpeza medindo cada etapa; os tempos voltam ao processo do app."""
+    if content_type not in ('pdf', 'text'):
+        raise ValueError(f"Tipo de conteúdo desconhecido: {content_type}")
+    started = time.perf_counter()
+    raw_text, pages = read()
+    read_done = time.perf_counter()
+    text = clean_text_for_llm(raw_text)
+    return ExtractionResult(text, pages, read_done - started, time.perf_counter() - read_done)
+
+def extract_document(data: bytes, content_type: str) -> ExtractionResult:
+    """Extrai e limpa o texto dos bytes do documento, seja PDF ou texto puro."""
+    def read():
+        if content_type == 'text':
+            return data.decode('utf-8'), 0
+        return _read_pdf_text(io.BytesIO(data))
+    return _read_and_clean(read, content_type)
+
+def extract_document_from_path(path: str, content_type: str) -> ExtractionResult:
+    """Extrai o texto de um arquivo em disco sem carregá-lo inteiro na memória."""
+    def read():
+        if content_type == 'text':
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read(), 0
+        with open(path, 'rb') as f:
+            return _read_pdf_text(f)
+    return _read_and_clean(read, content_type)
+
+def extract_document_text(data: bytes, content_type: str) -> str:
+    return extract_document(data, content_type).text
+
+def extract_document_text_from_path(path: str, content_type: str) -> str:
+    return extract_document_from_path(path, content_type).text
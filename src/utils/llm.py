@@ -1,18 +1,53 @@
 import os
+import sys
 import json
-import base64
-import io
+import time
+import asyncio
 import logging
-import re
-from typing import List, Dict, Any, Optional
-from fastapi import FastAPI, HTTPException
+import numpy as np
+from typing import List, Dict, Any, Awaitable, Literal, Optional
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from groq import Groq
-from openai import OpenAI
-from pypdf import PdfReader
-from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
+from src.utils.batch import content_type_for_path, list_document_paths, resolve_document_path, stream_batch
+from src.utils.classifier import CLASSIFIER_THRESHOLD, CentroidClassifier, Prediction, document_windows, pool_embeddings
+from src.utils.concurrency import (
+    concurrency_stats,
+    extraction_executor,
+    extraction_limiter,
+    llm_limiter,
+    run_in_executor,
+    shutdown_executors,
+    vector_search_limiter,
+)
+from src.utils.dedup import DuplicateIndex, minhash_signature
+from src.utils.embeddings import EmbeddingService
+from src.utils.extraction import ExtractionResult, decode_document, extract_document, extract_document_from_path
+from src.utils.llm_router import LLMBackend, LLMRouter
+from src.utils.metrics import (
+    LLM_CALLS,
+    PDF_PAGES,
+    TEXT_CHARS,
+    MetricsMiddleware,
+    record_llm_usage,
+    record_stage,
+    registry,
+    timed,
+)
+from src.utils.prompt_builder import categorizacao_document_text, compiled_system_prompt, curadoria_document_text
+from src.utils.prompts import (
+    CATEGORIZACAO_SYSTEM_PROMPT,
+    CATEGORIZACAO_USER_PROMPT,
+    CONTEXTO_REF_TEMPLATE,
+    CURADORIA_USER_PROMPT,
+    PROMPT_VERSION,
+)
+from src.utils.result_cache import ResultCache, result_key, text_hash
+from src.utils.startup import STARTUP_MODE, LazyResource, process_memory, startup_state
+from src.utils.text_cache import TextCache, content_hash, file_content_hash
+from src.utils.uploads import SpooledUpload, read_upload_request
+from src.utils.vector_index import VECTOR_INDEX_DIR, LocalVectorIndex
 
 # --- CONFIGURAÇÃO ---
 LOG_FILE = "llm.log"
@@ -42,108 +77,249 @@ app.add_middleware(
     allow_headers=["*"],
 )
 # ===========================================
+app.add_middleware(MetricsMiddleware)
 
 # Variáveis de Ambiente
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 QDRANT_COLLECTION = "BaseCurador"
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "auto") # 'qdrant', 'local' ou 'auto'
+
+GROQ_MODEL = "llama-3.1-8b-instant"
 
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://127.0.0.1:11434/v1")
 LLM_MODEL = os.getenv("LLM_MODEL", "llama3.1:8b")
 
-# Inicialização de Clientes (Lazy Loading Pattern)
-client_groq = None
-if GROQ_API_KEY:
-    try:
-        client_groq = Groq(api_key=GROQ_API_KEY)
-    except Exception as e:
-        logger.error(f"Erro ao iniciar Groq: {e}")
+# Ordem de preferência dos backends LLM e orçamentos por minuto (0 = sem limite local)
+LLM_BACKENDS = [b.strip() for b in os.getenv("LLM_BACKENDS", "groq,ollama").split(",") if b.strip()]
+GROQ_RPM = float(os.getenv("GROQ_RPM", 0))
+GROQ_TPM = float(os.getenv("GROQ_TPM", 0))
+OLLAMA_RPM = float(os.getenv("OLLAMA_RPM", 0))
+OLLAMA_TPM = float(os.getenv("OLLAMA_TPM", 0))
 
-client_llm = OpenAI(
-    base_url=OLLAMA_BASE_URL,
-    api_key="ollama",
-    timeout=120.0,
-)
+# Inicialização de Clientes (Lazy Loading Pattern)
+# Os SDKs só são importados quando o cliente é criado: no primeiro uso ou no warm-up.
+# Sem retries nos SDKs: backoff e failover ficam a cargo do roteador.
+def _groq_client():
+    from groq import AsyncGroq
+    return AsyncGroq(api_key=GROQ_API_KEY, max_retries=0)
+
+def _ollama_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(base_url=OLLAMA_BASE_URL, api_key="ollama", timeout=120.0, max_retries=0)
+
+def _qdrant_client():
+    # O construtor consulta a versão do servidor de forma síncrona; por isso roda fora do event loop.
+    from qdrant_client import AsyncQdrantClient
+    return AsyncQdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+
+_llm_backends = []
+for _name in LLM_BACKENDS:
+    if _name == "groq" and GROQ_API_KEY:
+        _llm_backends.append(LLMBackend("groq", LazyResource("groq", _groq_client, ("groq",)),
+                                        GROQ_MODEL, GROQ_RPM, GROQ_TPM))
+    elif _name == "ollama" and os.getenv("OLLAMA_BASE_URL"):
+        # Só com endereço explícito: sem um Ollama de fato rodando, o backend padrão
+        # tornaria o roteador sempre "disponível" e desligaria o retorno do palpite local.
+        _llm_backends.append(LLMBackend("ollama", LazyResource("ollama", _ollama_client, ("openai",)),
+                                        LLM_MODEL, OLLAMA_RPM, OLLAMA_TPM))
+llm_router = LLMRouter(_llm_backends)
+
+# Modelo que identifica as respostas no cache: só as do backend principal são guardadas.
+PRIMARY_MODEL = llm_router.primary.model if llm_router else GROQ_MODEL
 
 client_qdrant = None
+local_index = None
 encoder = None
 
-if QDRANT_URL and QDRANT_API_KEY:
+if VECTOR_BACKEND in ("qdrant", "auto") and QDRANT_URL and QDRANT_API_KEY:
+    client_qdrant = LazyResource("qdrant", _qdrant_client, ("qdrant_client",))
+
+if VECTOR_BACKEND == "local" or (VECTOR_BACKEND == "auto" and not client_qdrant):
     try:
-        client_qdrant = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
-        encoder = SentenceTransformer("all-MiniLM-L6-v2")
+        local_index = LocalVectorIndex()
+        if not len(local_index):
+            if VECTOR_BACKEND == "local":
+                logger.warning(f"Índice vetorial local vazio em {VECTOR_INDEX_DIR}; rode 'python -m src.utils.vector_index'.")
+            local_index = None
     except Exception as e:
-        logger.error(f"Erro ao iniciar Qdrant/Encoder: {e}")
+        logger.error(f"Erro ao abrir índice vetorial local: {e}")
+
+classifier = None
+try:
+    classifier = CentroidClassifier.load()
+except Exception as e:
+    logger.error(f"Erro ao carregar classificador local: {e}")
+
+# O modelo só é carregado no primeiro uso ou no warm-up (STARTUP_MODE=warm).
+if client_qdrant or local_index or classifier:
+    encoder = EmbeddingService()
+    if classifier and classifier.model != encoder.model_name:
+        logger.error(f"Classificador treinado com '{classifier.model}', mas o serviço usa '{encoder.model_name}'; desativado.")
+        classifier = None
+    if local_index and local_index.model and local_index.model != encoder.model_name:
+        # Vetores de outro modelo estão em outro espaço: a busca devolveria vizinhos sem relação.
+        logger.error(f"Índice vetorial local gerado com '{local_index.model}', mas o serviço usa '{encoder.model_name}'; desativado.")
+        local_index = None
+
+# O classificador só dispensa a LLM se a validação do treino mostrou recall suficiente em
+# cada categoria; senão, só responde quando nenhuma LLM responde.
+classifier_bypass = False
+if classifier:
+    classifier_bypass, _reason = classifier.bypass_check(CLASSIFIER_THRESHOLD)
+    if classifier_bypass:
+        logger.info(f"Classificador local dispensa a LLM com confiança >= {CLASSIFIER_THRESHOLD} ({_reason}).")
+    else:
+        logger.warning(f"Classificador local só como reserva da LLM: {_reason}.")
+
+text_cache = TextCache()
+result_cache = ResultCache()
+dedup_index = DuplicateIndex()
+
+CacheMode = Literal["use", "refresh", "bypass"]
 
 class PDFPayload(BaseModel):
     encoded_content: str
     content_type: str # 'pdf' or 'text'
     headers: List[str]
     category: Optional[str] = None
+    cache_mode: CacheMode = "use" # 'refresh' ignora o cache mas grava o resultado; 'bypass' nem lê nem grava
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    encoded_content: Optional[str] = None
+    content_type: Optional[str] = None # 'pdf' or 'text'; inferido pela extensão quando há 'path'
+    path: Optional[str] = None # relativo a DOCUMENTS_DIR
+    headers: Optional[List[str]] = None
+    category: Optional[str] = None
+
+class BatchPayload(BaseModel):
+    items: List[BatchItem] = []
+    directory: Optional[str] = None # ex.: "aprovados"; adiciona todos os arquivos que casam com 'pattern'
+    pattern: str = "*.pdf"
+    headers: List[str] = []
+    category: Optional[str] = None
+    concurrency: Optional[int] = None
+    cache_mode: CacheMode = "use"
 
 # --- FUNÇÕES AUXILIARES ---
 
-def clean_text_for_llm(text: str) -> str:
-    """Limpa ruídos de PDF e normaliza o texto para o LLM."""
-    if not text:
-        return ""
-    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', text)
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'(Page \d+ of \d+|Página \d+ de \d+)', '', text, flags=re.IGNORECASE)
-    return text.strip()
-
-def get_document_text(encoded_content: str, content_type: str) -> str:
-    """Extrai texto de conteúdo base64, seja PDF ou texto puro."""
+def _decode_and_lookup(encoded_content: str, content_type: str):
+    """Decodifica o payload e consulta o cache (roda fora do event loop)."""
+    with timed("decodificacao"):
+        data = decode_document(encoded_content, content_type)
+        key = content_hash(data, content_type)
+    return data, key, text_cache.get(key)
+
+def _record_extraction(result: ExtractionResult, content_type: str) -> str:
+    """Registra os tempos medidos no worker de extração e devolve o texto."""
+    record_stage("extracao_pdf" if content_type == "pdf" else "leitura_texto", result.read_seconds)
+    record_stage("limpeza", result.clean_seconds)
+    if content_type == "pdf":
+        PDF_PAGES.observe(result.pages)
+    return result.text
+
+def _observe_text(text: str) -> str:
+    TEXT_CHARS.observe(len(text))
+    return text
+
+async def get_document_text(encoded_content: str, content_type: str) -> str:
+    """Extrai texto de conteúdo base64, reaproveitando o cache endereçado por conteúdo."""
     try:
-        if content_type == 'text':
-            decoded_text = base64.b64decode(encoded_content).decode('utf-8')
-            return clean_text_for_llm(decoded_text)
-        elif content_type == 'pdf':
-            if "," in encoded_content:
-                encoded_content = encoded_content.split(",")[1]
-
-            pdf_data = base64.b64decode(encoded_content)
-            pdf_file = io.BytesIO(pdf_data)
-            reader = PdfReader(pdf_file)
-
-            raw_text = ""
-            max_pages = min(len(reader.pages), 10)
-
-            for i in range(max_pages):
-                page_text = reader.pages[i].extract_text()
-                if page_text:
-                    raw_text += page_text + "\n"
-
-            return clean_text_for_llm(raw_text)
-        else:
-            raise ValueError(f"Tipo de conteúdo desconhecido: {content_type}")
+        data, key, cached = await asyncio.to_thread(_decode_and_lookup, encoded_content, content_type)
+        if cached is not None:
+            return _observe_text(cached)
+
+        async with extraction_limiter.slot():
+            result = await run_in_executor(extraction_executor, extract_document, data, content_type)
+        text = _record_extraction(result, content_type)
+        await asyncio.to_thread(text_cache.put, key, text)
+        return _observe_text(text)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro na extração de texto: {e}")
+        raise HTTPException(status_code=400, detail=f"Erro ao ler conteúdo: {str(e)}")
+
+async def _get_file_text(path: str, key: str, content_type: str) -> str:
+    """Extrai o texto de um arquivo em disco já identificado pelo hash, lendo as páginas sob demanda."""
+    try:
+        cached = await asyncio.to_thread(text_cache.get, key)
+        if cached is not None:
+            return _observe_text(cached)
+
+        async with extraction_limiter.slot():
+            result = await run_in_executor(extraction_executor, extract_document_from_path, path, content_type)
+        text = _record_extraction(result, content_type)
+        await asyncio.to_thread(text_cache.put, key, text)
+        return _observe_text(text)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erro na extração de texto: {e}")
         raise HTTPException(status_code=400, detail=f"Erro ao ler conteúdo: {str(e)}")
 
-def search_similar_docs(text_query: str, limit: int = 3) -> str:
+async def get_upload_text(upload: SpooledUpload) -> str:
+    """Extrai o texto de um upload já gravado em disco."""
+    return await _get_file_text(upload.path, upload.key, upload.content_type)
+
+async def get_path_text(path: str, content_type: str) -> str:
+    """Extrai o texto de um documento do acervo em disco (ex.: documents/aprovados)."""
+    try:
+        key = await asyncio.to_thread(file_content_hash, path, content_type)
+    except OSError as e:
+        raise HTTPException(status_code=400, detail=f"Erro ao ler conteúdo: {str(e)}")
+    return await _get_file_text(path, key, content_type)
+
+async def search_similar_docs(text_query: str, limit: int = 3) -> str:
     """Busca fatos científicos existentes para verificar contradições."""
-    if not client_qdrant or not encoder:
+    if not (client_qdrant or local_index) or not encoder:
         return "Nenhum contexto prévio disponível."
     
     try:
-        query_vector = encoder.encode(text_query[:1000]).tolist()
-        hits = client_qdrant.search(
-            collection_name=QDRANT_COLLECTION,
-            query_vector=query_vector,
-            limit=limit
-        )
+        with timed("embedding"):
+            query_vector = await encoder.encode(text_query[:1000])
+        async with vector_search_limiter.slot():
+            with timed("busca_vetorial"):
+                if client_qdrant:
+                    qdrant = await client_qdrant.aget()
+                    response = await qdrant.query_points(
+                        collection_name=QDRANT_COLLECTION,
+                        query=query_vector.tolist(),
+                        limit=limit
+                    )
+                    payloads = [hit.payload for hit in response.points]
+                else:
+                    hits = await asyncio.to_thread(local_index.search, query_vector, limit)
+                    payloads = [payload for _, payload in hits]
         
         context = ""
-        for hit in hits:
-            snippet = hit.payload.get("text", "")[:500]
+        for payload in payloads:
+            snippet = payload.get("text", "")[:500]
             context += f"- {snippet}\n"
         return context if context else "Nenhum contexto prévio relevante encontrado."
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Erro na busca Qdrant: {e}")
+        logger.error(f"Erro na busca vetorial: {e}")
         return "Erro ao acessar o banco de conhecimento."
 
+async def classify_locally(document_text: str) -> Optional[Prediction]:
+    """Categoriza com o classificador local por centróides, sem chamar a LLM."""
+    if not classifier:
+        return None
+    try:
+        windows = document_windows(document_text)
+        with timed("classificador"):
+            vectors = await asyncio.gather(*[encoder.encode(window) for window in windows])
+            return classifier.predict(pool_embeddings(np.stack(vectors)))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro no classificador local: {e}")
+        return None
+
 def clean_json_string(json_str: str) -> str:
     """Remove blocos de markdown ```json ... ```."""
     json_str = json_str.strip()
@@ -156,30 +332,47 @@ def clean_json_string(json_str: str) -> str:
         json_str = "\n".join(lines)
     return json_str.strip()
 
-# --- ENDPOINT PRINCIPAL ---
-
-@app.post("/curadoria")
-async def curar_documento(payload: PDFPayload):
-    # 1. Verificação de Saúde
-    if not client_groq:
-        raise HTTPException(status_code=503, detail="Serviço indisponível: Groq não configurada.")
-
-    # 2. Extração de Texto
-    document_text = get_document_text(payload.encoded_content, payload.content_type)
-
+def _check_duplicate(endpoint: str, document_text: str, document_hash: str, category: Optional[str],
+                     headers: List[str], cache_mode: str):
+    """Assinatura MinHash do texto e, se houver, o resultado já gerado para uma quase-duplicata
+    dele com o mesmo esquema, marcado com a origem (roda fora do event loop)."""
+    with timed("deduplicacao"):
+        signature = minhash_signature(document_text)
+        if signature is None or cache_mode != "use":
+            return signature, None
+        for match in dedup_index.find(document_hash, signature):
+            cached = result_cache.get(
+                result_key(endpoint, match.document_hash, category, headers, PRIMARY_MODEL, PROMPT_VERSION)
+            )
+            if cached is not None:
+                dedup_index.record_duplicate()
+                return signature, {**cached, "_duplicate_of": {
+                    "document_hash": match.document_hash,
+                    "source": match.source,
+                    "similarity": round(match.similarity, 3),
+                }}
+    return signature, None
+
+# --- PIPELINE DE CURADORIA ---
+
+async def curar_texto(document_text: str, headers: List[str], category: Optional[str],
+                      cache_mode: str = "use", referencia_rag: Optional[Awaitable[str]] = None,
+                      source: Optional[str] = None) -> Dict[str, Any]:
+    """Executa a curadoria (RAG + LLM) sobre o texto já extraído do documento.
+
+    `referencia_rag` permite passar a busca vetorial já iniciada (ex.: em paralelo com a
+    categorização, no /analyze); sem ele, a busca é feita aqui. `source` identifica o
+    documento (ex.: caminho no lote) para quem depois for apontado como duplicata dele.
+    """
     # 3. Guardrail: Texto Vazio ou Insuficiente
     if len(document_text) < 150:
-        if not ("APROVAÇÃO CURADOR (marcar)" in payload.headers or "FEEDBACK DO CURADOR (escrever)" in payload.headers):
+        if not ("APROVAÇÃO CURADOR (marcar)" in headers or "FEEDBACK DO CURADOR (escrever)" in headers):
             raise HTTPException(status_code=400, detail="Texto insuficiente para análise.")
         else:
              return {"APROVAÇÃO CURADOR (marcar)": False, "FEEDBACK DO CURADOR (escrever)": "Rejeitado: Texto insuficiente para análise científica."}
 
-    # 4. RAG: Busca de Contexto
-    referencia_rag = search_similar_docs(document_text[:1000])
-    contexto_ref = f"### EXISTING DATABASE KNOWLEDGE (For Contradiction Check):\n{referencia_rag}\n"
-
-    # 5. Gerenciamento de Colunas e Schema
-    current_headers = list(payload.headers)
+    # 4. Gerenciamento de Colunas e Schema
+    current_headers = list(headers)
     if "CATEGORIA" in current_headers:
         current_headers.remove("CATEGORIA")
 
@@ -188,164 +381,140 @@ async def curar_documento(payload: PDFPayload):
     if "FEEDBACK DO CURADOR (escrever)" not in current_headers:
         current_headers.append("FEEDBACK DO CURADOR (escrever)")
 
-    json_skeleton = {header: "" for header in current_headers}
-    schema_str = json.dumps(json_skeleton, indent=2)
-
-    # 6. Prompt Engineering
-    if payload.category == "solos":
-        system_prompt = f"""Você é um assistente especializado em extração de metadados e curadoria científica de SOLOS (pedologia, física, química e biologia do solo).
-
-Sua Tarefa Principal: Extrair todos os metadados solicitados do texto fornecido e preencher o esquema JSON.
-
-**INSTRUÇÕES DE EXTRAÇÃO DE METADADOS (Siga para todos os campos):**
-- **Subtítulo:** Extraia o subtítulo do artigo, se houver.
-- **Caracteristicas do solo e região (escrever):** Descreva em um parágrafo as características do solo, clima e localização geográfica mencionadas no estudo. Se não mencionadas, deixe vazio.
-- **ferramentas e técnicas (seleção):** Liste as metodologias científicas, ferramentas de laboratório ou campo. Ex: "Análise granulométrica, Espectroscopia, Difração de Raios-X, Amostragem de solo". Sempre liste pelo menos uma se aplicável.
-- **nutrientes (seleção):** Liste os nutrientes, minerais ou elementos químicos foco do estudo do solo. Ex: "Nitrogênio, Fósforo, Carbono orgânico, Silício". Sempre liste pelo menos um se aplicável.
-- **estratégias de fornecimento de nutrientes (seleção):** Liste o modo de correção ou fertilização do solo. Ex: "Calagem, Gessagem, Adubação de base, Incorporação de resíduos". Sempre liste pelo menos uma se aplicável.
-- **grupos de culturas (seleção):** Liste os grandes grupos de culturas agrícolas investigados no solo. Sempre liste pelo menos um se aplicável.
-- **culturas presentes (seleção):** Liste os nomes específicos das culturas ou plantas estudadas. Sempre liste pelo menos uma se aplicável.
-
-**CONTEXTO DE CURADORIA (se aplicável):**
-Se os campos "APROVAÇÃO CURADOR (marcar)" e "FEEDBACK DO CURADOR (escrever)" estiverem presentes no esquema,
-você TAMBÉM atuará como um Curador Científico especializado em SOLOS, seguindo estes critérios:
-
-**CRITÉRIOS DE VALIDAÇÃO (OBRIGATÓRIOS - TODOS devem ser atendidos para aprovação):**
-1.  **Tópico Principal:** O FOCO PRINCIPAL do artigo deve ser o estudo do SOLO (manejo, conservação, fertilidade, física ou biologia do solo).
-    -   *REJEITAR* se o foco for puramente genética vegetal ou processamento industrial sem foco no solo.
-2.  **Formato:** Deve ser um artigo científico, tese ou estudo de caso detalhado com Metodologia e Resultados claros.
-3.  **Consistência:** Não deve contradizer fatos do 'EXISTING DATABASE KNOWLEDGE'.
-
-**REGRAS DE SAÍDA (Siga rigorosamente):**
-1.  Sua saída completa deve ser um único objeto JSON válido.
-2.  Preencha todos os campos de texto do esquema com base no conteúdo do documento. Garanta que os campos específicos (Caracteristicas do solo e região, ferramentas e técnicas, nutrientes, estratégias de fornecimento de nutrientes, grupos de culturas, culturas presentes) sejam sempre respondidos com informações relevantes, inferindo do contexto se necessário. Se um campo não puder ser encontrado ou não for aplicável, deixe vazio.
-3.  Se os campos de curadoria estiverem presentes:
-    -   Preencha o campo **'FEEDBACK DO CURADOR (escrever)'** com a razão explícita para sua decisão:
-        -   Se aprovando: Comece com "Aprovado:" e declare a contribuição específica para a ciência do solo (ex: "Aprovado: Avalia a compactação do solo sob diferentes sistemas de plantio.").
-        -   Se rejeitando: Comece com "Rejeitado:" e declare qual critério de validação falhou.
-    -   Defina o campo **'APROVAÇÃO CURADOR (marcar)'** como `true` or `false`.
-4.  **IDIOMA:** TODOS os valores de string no JSON devem estar em PORTUGUÊS (PT-BR). Não traduza as chaves JSON.
-
-ESQUEMA:
-{schema_str}
-"""
-    else:
-        system_prompt = f"""Você é um assistente especializado em extração de metadados e curadoria científica de CITROS E CANA (cultivo e manejo de citricultura e cana-de-açúcar).
-
-Sua Tarefa Principal: Extrair todos os metadados solicitados do texto fornecido e preencher o esquema JSON.
-
-**INSTRUÇÕES DE EXTRAÇÃO DE METADADOS (Siga para todos os campos):**
-- **Subtítulo:** Extraia o subtítulo do artigo, se houver.
-- **Caracteristicas do solo e região (escrever):** Descreva em um parágrafo as características do solo, clima e localização geográfica mencionadas no estudo de citros ou cana. Se não mencionadas, deixe vazio.
-- **ferramentas e técnicas (seleção):** Liste, em formato de string separada por vírgulas, as principais ferramentas, equipamentos e metodologias científicas utilizadas. Ex: "Cromatografia gasosa, Fotossíntese líquida, RCBD, ANOVA". Sempre liste pelo menos uma se aplicável.
-- **nutrientes (seleção):** Liste, em formato de string separada por vírgulas, todos os nutrientes ou compostos que são foco do estudo. Ex: "Nitrogênio, Potássio, Sacarose, Ácidos orgânicos". Sempre liste pelo menos um se aplicável.
-- **estratégias de fornecimento de nutrientes (seleção):** Liste, em formato de string separada por vírgulas, as estratégias de fertilização ou manejo. Ex: "Fertirrigação, Aplicação foliar, Controle de pragas, Poda". Sempre liste pelo menos uma se aplicável.
-- **grupos de culturas (seleção):** Liste "Frutíferas" para citros ou "Grandes Culturas" para cana, conforme o caso.
-- **culturas presentes (seleção):** Liste os nomes específicos das culturas estudadas (ex: Laranja Hamlin, Cana-de-açúcar RB867515). Sempre liste pelo menos uma se aplicável.
-
-**CONTEXTO DE CURADORIA (se aplicável):**
-Se os campos "APROVAÇÃO CURADOR (marcar)" e "FEEDBACK DO CURADOR (escrever)" estiverem presentes no esquema,
-você TAMBÉM atuará como um Curador Científico especializado em CITROS E CANA, seguindo estes critérios:
-
-**CRITÉRIOS DE VALIDAÇÃO (OBRIGATÓRIOS - TODOS devem ser atendidos para aprovação):**
-1.  **Tópico Principal:** O FOCO PRINCIPAL do artigo deve ser CITROS (laranja, limão, tangerina, etc.) ou CANA-DE-AÇÚCAR (produção, manejo, doenças, nutrição).
-    -   *REJEITAR* se o tópico for outras culturas sem relação com citros ou cana.
-2.  **Formato:** Deve ser um artigo científico, tese ou estudo de caso detalhado com Metodologia e Resultados claros.
-3.  **Consistência:** Não deve contradizer fatos do 'EXISTING DATABASE KNOWLEDGE'.
-
-**REGRAS DE SAÍDA (Siga rigorosamente):**
-1.  Sua saída completa deve ser um único objeto JSON válido.
-2.  Preencha todos os campos de texto do esquema com base no conteúdo do documento.
-3.  Se os campos de curadoria estiverem presentes:
-    -   Preencha o campo **'FEEDBACK DO CURADOR (escrever)'** com a razão explícita para sua decisão:
-        -   Se aprovando: Comece com "Aprovado:" e depois declare brevemente a contribuição específica (ex: "Aprovado: Detalha a resposta da cana-de-açúcar à adubação nitrogenada.").
-        -   Se rejeitando: Comece com "Rejeitado:" e depois declare qual critério falhou.
-    -   Defina o campo **'APROVAÇÃO CURADOR (marcar)'** como `true` ou `false`.
-4.  **IDIOMA:** TODOS os valores de string no JSON devem estar em PORTUGUÊS (PT-BR). Não traduza as chaves JSON.
-
-ESQUEMA:
-{schema_str}
-"""
-
-    user_prompt = f"""
-### TAREFA
-1. Analise o TEXTO DE ENTRADA.
-2. Compare com o CONHECIMENTO EXISTENTE DO BANCO DE DADOS (se fornecido).
-3. Preencha o ESQUEMA JSON ALVO com os metadados extraídos.
-
-{contexto_ref if referencia_rag != "Nenhum contexto prévio disponível." else ""}
-
-### TEXTO DE ENTRADA
-'''
-{document_text[:6000]}
-'''
-
-### SAÍDA
-Retorne APENAS o objeto JSON preenchido."""
+    # 5. Cache de Respostas (evita repetir RAG + LLM para o mesmo documento e esquema)
+    document_hash = text_hash(document_text)
+    cache_key = result_key("curadoria", document_hash, category, current_headers, PRIMARY_MODEL, PROMPT_VERSION)
+    if cache_mode == "use":
+        with timed("cache_resultados"):
+            cached = await asyncio.to_thread(result_cache.get, cache_key)
+        if cached is not None:
+            logger.info("Curadoria obtida do cache de respostas.")
+            return cached
+
+    # 5b. Quase-duplicatas: outra cópia do documento (ex.: "arquivo (1).pdf") já curada
+    signature = None
+    if dedup_index.enabled and cache_mode != "bypass":
+        signature, duplicate = await asyncio.to_thread(
+            _check_duplicate, "curadoria", document_text, document_hash, category, current_headers, cache_mode
+        )
+        if duplicate is not None:
+            logger.info(f"Curadoria reaproveitada de quase-duplicata: {duplicate['_duplicate_of']}")
+            return duplicate
+
+    # 6. RAG: Busca de Contexto
+    referencia_rag = await (referencia_rag or search_similar_docs(document_text[:1000]))
+    contexto_ref = CONTEXTO_REF_TEMPLATE.format(referencia_rag=referencia_rag)
+
+    # 7. Prompt Engineering: prompt de sistema compilado por (categoria, colunas) e
+    # trechos do documento escolhidos por seção dentro do orçamento de tokens
+    with timed("montagem_prompt"):
+        system_prompt = compiled_system_prompt(category, tuple(current_headers))
+        user_prompt = CURADORIA_USER_PROMPT.format(
+            contexto_ref=contexto_ref if referencia_rag != "Nenhum contexto prévio disponível." else "",
+            document_text=curadoria_document_text(document_text, current_headers),
+        )
 
     logger.info(f"--- INICIANDO CURADORIA ---")
-    logger.info(f"Payload Category: {payload.category}")
+    logger.info(f"Payload Category: {category}")
 
     try:
-        completion = client_groq.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            model="llama-3.1-8b-instant",
-            temperature=0.0,
-            response_format={"type": "json_object"}
-        )
-
+        async with llm_limiter.slot():
+            with timed("llm"):
+                routed = await llm_router.complete(
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    temperature=0.0,
+                    response_format={"type": "json_object"}
+                )
+        completion = routed.completion
+
+        LLM_CALLS.inc(endpoint="curadoria", outcome="ok")
+        record_llm_usage("curadoria", completion)
         raw_response = completion.choices[0].message.content
-        logger.info(f"Resposta Bruta da LLM: {raw_response}")
+        usage = getattr(completion, "usage", None)
+        logger.info(f"Resposta da LLM ({routed.backend.name}) recebida: {len(raw_response or '')} caracteres, "
+                    f"{getattr(usage, 'total_tokens', '?')} tokens.")
+        logger.debug(f"Resposta Bruta da LLM: {raw_response}")
         
         clean_response = clean_json_string(raw_response)
-        return json.loads(clean_response)
+        result = json.loads(clean_response)
+
+        if cache_mode != "bypass" and routed.primary:
+            await asyncio.to_thread(result_cache.put, cache_key, result, "curadoria", PRIMARY_MODEL, PROMPT_VERSION)
+            if signature is not None:
+                await asyncio.to_thread(dedup_index.add, document_hash, signature, source)
+        return result
 
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Erro Groq: {e}")
+        LLM_CALLS.inc(endpoint="curadoria", outcome="erro")
+        logger.error(f"Erro na LLM: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/categorize")
-async def categorize_article(payload: PDFPayload):
-    if not client_groq:
-        raise HTTPException(status_code=503, detail="Serviço indisponível: Groq não configurada.")
-
-    document_text = get_document_text(payload.encoded_content, payload.content_type)
-
+async def categorizar_texto(document_text: str, cache_mode: str = "use", source: Optional[str] = None) -> Dict[str, Any]:
+    """Classifica o texto já extraído em uma das categorias do acervo."""
     if len(document_text) < 100:
         raise HTTPException(status_code=400, detail="Texto insuficiente para categorização.")
 
-    system_prompt = """Você é um assistente especializado em classificação de artigos científicos agrícolas.
-
-Classifique o artigo em UMA das seguintes categorias:
-1. **solos** - Artigos sobre pedologia, física do solo, química do solo, biologia do solo, manejo e conservação do solo, fertilidade do solo, nutrição de plantas via solo
-2. **citros e cana** - Artigos sobre cultivo, manejo, nutrição e fisiologia de citros (laranja, limão, tangerina) ou cana-de-açúcar
-
-Instruções:
-- Analise o CONTEÚDO PRINCIPAL do artigo
-- Se o foco principal for SOLO, retorne "solos"
-- Se o foco principal for CITROS ou CANA, retorne "citros e cana"
-- Retorne APENAS o nome exato da categoria, em minúsculas
-
-Categorias válidas:
-- solos
-- citros e cana"""
-
-    user_prompt = f"ARTIGO:\n{document_text[:6000]}\n\nCLASSIFICAÇÃO:"
-
-    try:
-        completion = client_groq.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            model="llama-3.1-8b-instant",
-            temperature=0.0,
-            max_tokens=50,
+    document_hash = text_hash(document_text)
+    cache_key = result_key("categorize", document_hash, None, [], PRIMARY_MODEL, PROMPT_VERSION)
+    if cache_mode == "use":
+        with timed("cache_resultados"):
+            cached = await asyncio.to_thread(result_cache.get, cache_key)
+        if cached is not None:
+            return cached
+
+    signature = None
+    if dedup_index.enabled and cache_mode != "bypass":
+        signature, duplicate = await asyncio.to_thread(
+            _check_duplicate, "categorize", document_text, document_hash, None, [], cache_mode
         )
+        if duplicate is not None:
+            return duplicate
+
+    # Caminho rápido: classificador local validado; a LLM só é chamada com confiança abaixo do limiar.
+    # Sem o bypass, o palpite local só é calculado se a LLM falhar (ou se não houver LLM).
+    prediction = None
+    if classifier_bypass or not llm_router:
+        prediction = await classify_locally(document_text)
+    if prediction and ((classifier_bypass and prediction.confidence >= CLASSIFIER_THRESHOLD) or not llm_router):
+        logger.info(f"Categorização local: {prediction.category} (confiança {prediction.confidence})")
+        return {"category": prediction.category, "confidence": prediction.confidence, "source": "local"}
+    if not llm_router:
+        raise HTTPException(status_code=503, detail="Serviço indisponível: nenhum backend LLM configurado.")
+
+    system_prompt = CATEGORIZACAO_SYSTEM_PROMPT
+    user_prompt = CATEGORIZACAO_USER_PROMPT.format(document_text=categorizacao_document_text(document_text))
 
+    try:
+        try:
+            async with llm_limiter.slot():
+                with timed("llm"):
+                    routed = await llm_router.complete(
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_prompt}
+                        ],
+                        temperature=0.0,
+                        max_tokens=50,
+                    )
+        except Exception as e:
+            if prediction is None and not classifier_bypass:
+                prediction = await classify_locally(document_text)
+            if prediction is None:
+                raise
+            # Sem LLM que responda (backends fora, sem orçamento, fila cheia): vale o palpite local.
+            LLM_CALLS.inc(endpoint="categorize", outcome="erro")
+            logger.warning(f"LLM indisponível ({getattr(e, 'detail', e)}); usando a categorização local: "
+                           f"{prediction.category} (confiança {prediction.confidence})")
+            return {"category": prediction.category, "confidence": prediction.confidence, "source": "local"}
+        completion = routed.completion
+
+        LLM_CALLS.inc(endpoint="categorize", outcome="ok")
+        record_llm_usage("categorize", completion)
         category = completion.choices[0].message.content.strip().lower()
         
         # Normalização de categorias
@@ -361,12 +530,386 @@ Categorias válidas:
                 category = "citros e cana"
 
         logger.info(f"Categorização realizada: {category}")
-        return {"category": category}
-
+        result = {
+            "category": category,
+            "confidence": None,
+            "source": "llm",
+            "backend": routed.backend.name,
+            "local_confidence": prediction.confidence if prediction else None,
+        }
+
+        if cache_mode != "bypass" and routed.primary:
+            await asyncio.to_thread(result_cache.put, cache_key, result, "categorize", PRIMARY_MODEL, PROMPT_VERSION)
+            if signature is not None:
+                await asyncio.to_thread(dedup_index.add, document_hash, signature, source)
+        return result
+
+    except HTTPException:
+        raise
     except Exception as e:
+        LLM_CALLS.inc(endpoint="categorize", outcome="erro")
         logger.error(f"Erro na categorização: {e}")
         raise HTTPException(status_code=500, detail=f"Erro ao categorizar: {str(e)}")
 
+async def analisar_texto(document_text: str, headers: List[str], category: Optional[str],
+                         cache_mode: str = "use", source: Optional[str] = None) -> Dict[str, Any]:
+    """Categoriza e cura o mesmo texto em uma passada.
+
+    A busca vetorial não depende da categoria, então roda em paralelo com a
+    categorização; a curadoria usa o prompt da categoria encontrada. Se o cliente já
+    informa a categoria, a categorização é pulada.
+    """
+    if len(document_text) < 150:
+        # Texto curto: a curadoria decide entre rejeitar e devolver 400.
+        return {"categorization": None,
+                "curation": await curar_texto(document_text, headers, category, cache_mode, source=source)}
+
+    rag_task = asyncio.ensure_future(search_similar_docs(document_text[:1000]))
+    try:
+        if category:
+            categorization = {"category": category, "confidence": None, "source": "payload"}
+        else:
+            categorization = await categorizar_texto(document_text, cache_mode, source)
+        curation = await curar_texto(document_text, headers, categorization["category"], cache_mode, rag_task, source)
+    finally:
+        # Resposta do cache ou erro na categorização: a busca deixa de ser necessária.
+        if not rag_task.done():
+            rag_task.cancel()
+        elif not rag_task.cancelled():
+            rag_task.exception()  # marca eventual exceção como tratada
+    return {"categorization": categorization, "curation": curation}
+
+# --- ENDPOINTS ---
+
+@app.post("/curadoria")
+async def curar_documento(payload: PDFPayload):
+    # 1. Verificação de Saúde
+    if not llm_router:
+        raise HTTPException(status_code=503, detail="Serviço indisponível: nenhum backend LLM configurado.")
+
+    # 2. Extração de Texto
+    document_text = await get_document_text(payload.encoded_content, payload.content_type)
+    return await curar_texto(document_text, payload.headers, payload.category, payload.cache_mode)
+
+@app.post("/curadoria/upload")
+async def curar_documento_upload(request: Request):
+    """Variante de /curadoria que recebe o arquivo em multipart ou no corpo cru, sem base64."""
+    if not llm_router:
+        raise HTTPException(status_code=503, detail="Serviço indisponível: nenhum backend LLM configurado.")
+
+    form = await read_upload_request(request)
+    try:
+        document_text = await get_upload_text(form.upload)
+    finally:
+        form.upload.cleanup()
+    return await curar_texto(document_text, form.headers, form.category, form.cache_mode)
+
+@app.post("/categorize")
+async def categorize_article(payload: PDFPayload):
+    if not llm_router and not classifier:
+        raise HTTPException(status_code=503, detail="Serviço indisponível: nenhum backend LLM configurado.")
+
+    document_text = await get_document_text(payload.encoded_content, payload.content_type)
+    return await categorizar_texto(document_text, payload.cache_mode)
+
+@app.post("/categorize/upload")
+async def categorize_article_upload(request: Request):
+    """Variante de /categorize que recebe o arquivo em multipart ou no corpo cru, sem base64."""
+    if not llm_router and not classifier:
+        raise HTTPException(status_code=503, detail="Serviço indisponível: nenhum backend LLM configurado.")
+
+    form = await read_upload_request(request)
+    try:
+        document_text = await get_upload_text(form.upload)
+    finally:
+        form.upload.cleanup()
+    return await categorizar_texto(document_text, form.cache_mode)
+
+@app.post("/analyze")
+async def analyze_article(payload: PDFPayload):
+    """Extrai o texto uma vez, categoriza e cura, devolvendo os dois resultados."""
+    if not llm_router:
+        raise HTTPException(status_code=503, detail="Serviço indisponível: nenhum backend LLM configurado.")
+
+    document_text = await get_document_text(payload.encoded_content, payload.content_type)
+    return await analisar_texto(document_text, payload.headers, payload.category, payload.cache_mode)
+
+@app.post("/analyze/upload")
+async def analyze_article_upload(request: Request):
+    """Variante de /analyze que recebe o arquivo em multipart ou no corpo cru, sem base64."""
+    if not llm_router:
+        raise HTTPException(status_code=503, detail="Serviço indisponível: nenhum backend LLM configurado.")
+
+    form = await read_upload_request(request)
+    try:
+        document_text = await get_upload_text(form.upload)
+    finally:
+        form.upload.cleanup()
+    return await analisar_texto(document_text, form.headers, form.category, form.cache_mode)
+
+async def _batch_item_text(item: BatchItem) -> str:
+    if item.path:
+        path = resolve_document_path(item.path)
+        return await get_path_text(path, item.content_type or content_type_for_path(path))
+    if item.encoded_content:
+        return await get_document_text(item.encoded_content, item.content_type or "pdf")
+    raise HTTPException(status_code=400, detail="Item sem 'encoded_content' nem 'path'.")
+
+def _batch_items(payload: BatchPayload) -> List[BatchItem]:
+    items = list(payload.items)
+    if payload.directory:
+        for path in list_document_paths(payload.directory, payload.pattern):
+            items.append(BatchItem(id=os.path.basename(path), path=path))
+    if not items:
+        raise HTTPException(status_code=400, detail="Lote vazio.")
+    return items
+
+def _batch_item_id(index: int, item: BatchItem) -> Optional[str]:
+    return item.id or item.path or str(index)
+
+@app.post("/curadoria/batch")
+async def curar_lote(payload: BatchPayload):
+    """Cura vários documentos em paralelo, retornando uma linha NDJSON por documento à medida que terminam."""
+    if not llm_router:
+        raise HTTPException(status_code=503, detail="Serviço indisponível: nenhum backend LLM configurado.")
+
+    items = _batch_items(payload)
+
+    async def worker(item: BatchItem) -> Dict[str, Any]:
+        document_text = await _batch_item_text(item)
+        return await curar_texto(document_text, item.headers or payload.headers, item.category or payload.category,
+                                 payload.cache_mode, source=item.path or item.id)
+
+    lines = stream_batch(items, worker, _batch_item_id, payload.concurrency)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@app.post("/categorize/batch")
+async def categorizar_lote(payload: BatchPayload):
+    """Categoriza vários documentos em paralelo, retornando uma linha NDJSON por documento."""
+    if not llm_router and not classifier:
+        raise HTTPException(status_code=503, detail="Serviço indisponível: nenhum backend LLM configurado.")
+
+    items = _batch_items(payload)
+
+    async def worker(item: BatchItem) -> Dict[str, Any]:
+        return await categorizar_texto(await _batch_item_text(item), payload.cache_mode, item.path or item.id)
+
+    lines = stream_batch(items, worker, _batch_item_id, payload.concurrency)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@app.post("/analyze/batch")
+async def analisar_lote(payload: BatchPayload):
+    """Categoriza e cura vários documentos em paralelo, retornando uma linha NDJSON por documento."""
+    if not llm_router:
+        raise HTTPException(status_code=503, detail="Serviço indisponível: nenhum backend LLM configurado.")
+
+    items = _batch_items(payload)
+
+    async def worker(item: BatchItem) -> Dict[str, Any]:
+        document_text = await _batch_item_text(item)
+        return await analisar_texto(document_text, item.headers or payload.headers, item.category or payload.category,
+                                    payload.cache_mode, item.path or item.id)
+
+    lines = stream_batch(items, worker, _batch_item_id, payload.concurrency)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {"text": text_cache.stats(), "results": result_cache.stats(), "dedup": dedup_index.stats(),
+            "prompt_version": PROMPT_VERSION}
+
+@app.delete("/cache/results")
+def invalidate_result_cache(stale_only: bool = False):
+    """Apaga o cache de respostas da LLM; com stale_only=true, só o gerado por outras versões de prompt."""
+    removed = result_cache.invalidate(PROMPT_VERSION, keep_current=True) if stale_only else result_cache.invalidate()
+    return {"removed": removed, "prompt_version": PROMPT_VERSION}
+
+@app.get("/concurrency/stats")
+def get_concurrency_stats():
+    return concurrency_stats()
+
+@app.get("/llm/stats")
+def llm_stats():
+    """Roteamento entre backends LLM: orçamentos, backoff, latências e hedging."""
+    return llm_router.stats()
+
+@app.get("/embeddings/stats")
+def embeddings_stats():
+    return encoder.stats() if encoder else {"loaded": False}
+
+def _component_metrics():
+    """Expõe no /metrics o estado de caches, filas e do serviço de embeddings, lido só no scrape."""
+    text_stats, result_stats = text_cache.stats(), result_cache.stats()
+    families = [
+        ("curadoria_cache_lookups", "counter", "Consultas aos caches por resultado.", [
+            ("curadoria_cache_lookups_total", {"cache": "texto", "result": "hit"}, text_stats["hits"]),
+            ("curadoria_cache_lookups_total", {"cache": "texto", "result": "miss"}, text_stats["misses"]),
+            ("curadoria_cache_lookups_total", {"cache": "resultados", "result": "hit"}, result_stats["hits"]),
+            ("curadoria_cache_lookups_total", {"cache": "resultados", "result": "miss"}, result_stats["misses"]),
+        ]),
+        ("curadoria_cache_bytes", "gauge", "Bytes ocupados pelos caches.", [
+            ("curadoria_cache_bytes", {"cache": "texto"}, text_stats["memory_bytes"]),
+            ("curadoria_cache_bytes", {"cache": "resultados"}, result_stats["size_bytes"]),
+        ]),
+    ]
+
+    dedup_stats = dedup_index.stats()
+    families.append(("curadoria_dedup_lookups", "counter", "Consultas ao índice de quase-duplicatas por resultado.", [
+        ("curadoria_dedup_lookups_total", {"result": "duplicata"}, dedup_stats["duplicates"]),
+        ("curadoria_dedup_lookups_total", {"result": "unico"}, dedup_stats["lookups"] - dedup_stats["duplicates"]),
+    ]))
+    families.append(("curadoria_dedup_documents", "gauge", "Documentos no índice de quase-duplicatas.", [
+        ("curadoria_dedup_documents", {}, dedup_stats["documents"]),
+    ]))
+
+    stages = concurrency_stats()
+    for field, kind, help_text in (("in_flight", "gauge", "Tarefas em execução por estágio."),
+                                   ("waiting", "gauge", "Tarefas aguardando vaga por estágio."),
+                                   ("rejected", "counter", "Requisições recusadas por fila cheia."),
+                                   ("timed_out", "counter", "Requisições com espera esgotada.")):
+        name = f"curadoria_stage_{field}"
+        sample_name = f"{name}_total" if kind == "counter" else name
+        families.append((name, kind, help_text,
+                         [(sample_name, {"stage": stage}, values[field]) for stage, values in stages.items()]))
+
+    if encoder:
+        emb = encoder.stats()
+        families.append(("curadoria_embedding_lookups", "counter", "Pedidos de embedding por resultado do cache.", [
+            ("curadoria_embedding_lookups_total", {"result": "hit"}, emb["cache_hits"]),
+            ("curadoria_embedding_lookups_total", {"result": "miss"}, emb["requests"] - emb["cache_hits"]),
+        ]))
+        families.append(("curadoria_embedding_queue_depth", "gauge", "Textos na fila de embeddings.", [
+            ("curadoria_embedding_queue_depth", {}, emb["queue_depth"]),
+        ]))
+        families.append(("curadoria_embedding_model_loaded", "gauge", "1 se o modelo de embeddings está carregado.", [
+            ("curadoria_embedding_model_loaded", {}, int(emb["loaded"])),
+        ]))
+    return families
+
+registry.add_collector(_component_metrics)
+
+@app.get("/metrics")
+def metrics():
+    """Métricas no formato texto do Prometheus."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# --- STARTUP E SAÚDE ---
+
+def _lazy_resources() -> List[LazyResource]:
+    resources = [backend.client for backend in llm_router.backends]
+    if client_qdrant:
+        resources.append(client_qdrant)
+    return resources
+
+def preload() -> None:
+    """Importa os SDKs e carrega os pesos do modelo de embeddings, sem criar clientes,
+    conexões ou threads.
+
+    No servidor pré-forkado roda no processo pai, antes do fork: os workers herdam
+    módulos e pesos em copy-on-write em vez de carregar cada um a sua cópia.
+    """
+    for resource in _lazy_resources():
+        resource.import_modules()
+    if encoder:
+        encoder.load()
+
+def warm_up() -> None:
+    """Carrega tudo o que o modo lazy deixaria para o primeiro pedido (STARTUP_MODE=warm)."""
+    startup_state.warmup = "running"
+    try:
+        started = time.perf_counter()
+        preload()
+        startup_state.warmup_seconds["preload"] = round(time.perf_counter() - started, 3)
+        for resource in _lazy_resources():
+            started = time.perf_counter()
+            try:
+                resource.get()
+            except Exception as e:
+                # Clientes que falham (ex.: Qdrant fora do ar) são tentados de novo no primeiro uso.
+                logger.error(f"Warm-up de {resource.name} falhou: {e}")
+            startup_state.warmup_seconds[resource.name] = round(time.perf_counter() - started, 3)
+        if encoder:
+            started = time.perf_counter()
+            encoder.warm_up()
+            startup_state.warmup_seconds["embeddings"] = round(time.perf_counter() - started, 3)
+        startup_state.warmup = "done"
+        logger.info(f"Warm-up concluído: {startup_state.warmup_seconds}")
+    except Exception as e:
+        startup_state.warmup = "failed"
+        startup_state.error = str(e)
+        logger.error(f"Erro no warm-up: {e}")
+
+def after_fork(worker: int, workers: int) -> None:
+    """Prepara um worker recém-forkado: conexões SQLite próprias e threads do torch divididas."""
+    startup_state.forked(worker)
+    # Cada worker tem os próprios contadores: o label distingue as séries no Prometheus.
+    registry.set_constant_labels(worker=worker)
+    # Clientes LLM/Qdrant criados no pai (pools HTTP, canais gRPC) não sobrevivem ao fork.
+    for resource in _lazy_resources():
+        resource.reset()
+    result_cache.reopen()
+    dedup_index.reopen()
+    torch = sys.modules.get("torch")
+    if torch is not None and workers > 1:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+def _subsystems() -> Dict[str, Any]:
+    if client_qdrant:
+        vector = {"backend": "qdrant", **client_qdrant.status()}
+    else:
+        vector = {"backend": "local" if local_index else None, "loaded": local_index is not None,
+                  "vectors": len(local_index) if local_index else 0}
+    return {
+        "llm": {backend.name: {"model": backend.model, **backend.client.status()} for backend in llm_router.backends},
+        "vector": vector,
+        "embeddings": {"model": encoder.model_name, "loaded": encoder.loaded, "load_seconds": encoder.load_seconds}
+                      if encoder else {"loaded": False},
+        "classifier": {"loaded": classifier is not None, "llm_bypass": classifier_bypass},
+        "result_cache": {"enabled": result_cache.enabled},
+        "dedup": {"enabled": dedup_index.enabled, "documents": len(dedup_index)},
+    }
+
+@app.get("/health/live")
+def liveness():
+    """Sonda de liveness: só indica que o processo responde, sem depender de subsistemas."""
+    return {
+        "status": "alive",
+        "pid": os.getpid(),
+        "worker": startup_state.worker,
+        "uptime_seconds": startup_state.uptime(),
+        "memory": process_memory(),
+    }
+
+@app.get("/health/ready")
+def readiness():
+    """Sonda de readiness: 200 depois do warm-up, se houver como atender (LLM ou classificador)."""
+    ready = startup_state.warm and bool(llm_router or classifier)
+    body = {
+        "ready": ready,
+        "mode": startup_state.mode,
+        "warmup": startup_state.warmup,
+        "warmup_seconds": startup_state.warmup_seconds,
+        "error": startup_state.error,
+        "pid": os.getpid(),
+        "worker": startup_state.worker,
+        "uptime_seconds": startup_state.uptime(),
+        "subsystems": _subsystems(),
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+@app.on_event("startup")
+async def on_startup():
+    removed = await asyncio.to_thread(result_cache.invalidate, PROMPT_VERSION, True)
+    if removed:
+        logger.info(f"Cache de respostas: {removed} entradas de versões antigas dos prompts removidas.")
+    if STARTUP_MODE == "warm":
+        # Em segundo plano: /health/live responde de imediato e /health/ready só após o warm-up.
+        app.state.warmup_task = asyncio.create_task(asyncio.to_thread(warm_up))
+
+@app.on_event("shutdown")
+def on_shutdown():
+    shutdown_executors()
+
 @app.get("/")
 def read_root():
     return {"status": "online", "version": "v12-Contradiction-Fixed", "service": "Groq Cloud"}
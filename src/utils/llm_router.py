@@ -0,0 +1,340 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+from fastapi import HTTPException
+from src.utils.metrics import LLM_BACKEND_SECONDS, LLM_ROUTING
+from src.utils.startup import LazyResource
+
+logger = logging.getLogger(__name__)
+
+# Variáveis de Ambiente
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", 2))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", 60))
+LLM_MAX_BUDGET_WAIT_SECONDS = float(os.getenv("LLM_MAX_BUDGET_WAIT_SECONDS", 5))
+# Percentil de latência do backend principal a partir do qual uma cópia da requisição é
+# enviada ao próximo backend (0 desliga o hedging).
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 0))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+
+LATENCY_WINDOW = 200
+DEFAULT_COMPLETION_TOKENS = 512
+
+
+class TokenBucket:
+    """Balde de fichas reabastecido continuamente: `per_minute` fichas por minuto.
+
+    Com `per_minute` <= 0 o balde é ilimitado. O consumo pode deixar o saldo negativo
+    (ex.: ajuste pelo uso real informado pela API), o que atrasa os próximos pedidos.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Segundos até haver `amount` fichas (0 se já há)."""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def consume(self, amount: float) -> None:
+        if not self.unlimited:
+            self._refill()
+            self.level -= amount
+
+    def snapshot(self) -> Optional[float]:
+        if self.unlimited:
+            return None
+        self._refill()
+        return round(self.level, 1)
+
+
+class LLMBackend:
+    """Um provedor de chat compatível com a API da OpenAI, com orçamento e backoff próprios.
+
+    O cliente do SDK é criado (e o SDK importado) na primeira chamada ou no warm-up.
+    """
+
+    def __init__(self, name: str, client: LazyResource, model: str, requests_per_minute: float = 0,
+                 tokens_per_minute: float = 0):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.cooldown_until = 0.0
+        self.consecutive_failures = 0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+
+    def cooldown_remaining(self) -> float:
+        return max(0.0, self.cooldown_until - time.monotonic())
+
+    def wait_time(self, estimated_tokens: int) -> float:
+        return max(self.cooldown_remaining(), self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+
+    def reserve(self, estimated_tokens: int) -> None:
+        self.requests.consume(1)
+        self.tokens.consume(estimated_tokens)
+
+    def back_off(self, retry_after: Optional[float]) -> float:
+        self.consecutive_failures += 1
+        delay = retry_after if retry_after is not None else min(
+            LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** (self.consecutive_failures - 1)
+        )
+        self.cooldown_until = time.monotonic() + delay
+        return delay
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        if len(self._latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+    async def complete(self, **kwargs: Any) -> Any:
+        self.calls += 1
+        started = time.perf_counter()
+        try:
+            client = await self.client.aget()
+            completion = await client.chat.completions.create(model=self.model, **kwargs)
+        except asyncio.CancelledError:
+            LLM_BACKEND_SECONDS.observe(time.perf_counter() - started, backend=self.name, outcome="cancelado")
+            raise
+        except Exception:
+            self.failures += 1
+            LLM_BACKEND_SECONDS.observe(time.perf_counter() - started, backend=self.name, outcome="erro")
+            raise
+        elapsed = time.perf_counter() - started
+        self._latencies.append(elapsed)
+        self.successes += 1
+        self.consecutive_failures = 0
+        LLM_BACKEND_SECONDS.observe(elapsed, backend=self.name, outcome="ok")
+        return completion
+
+    def stats(self) -> Dict[str, Any]:
+        ordered = sorted(self._latencies)
+
+        def pct(q: float) -> Optional[float]:
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 1) if ordered else None
+
+        return {
+            "model": self.model,
+            "client_loaded": self.client.loaded,
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "cooldown_seconds": round(self.cooldown_remaining(), 1),
+            "requests_budget": self.requests.snapshot(),
+            "tokens_budget": self.tokens.snapshot(),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+        }
+
+
+class RoutedCompletion(NamedTuple):
+    completion: Any
+    backend: LLMBackend
+    primary: bool
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    return getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _estimate_tokens(messages: List[Dict[str, str]], max_tokens: Optional[int]) -> int:
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    return prompt_chars // 4 + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+class LLMRouter:
+    """Distribui as chamadas de chat entre os backends configurados, em ordem de preferência.
+
+    Cada backend tem orçamento de requisições e tokens por minuto (token bucket) e entra
+    em backoff ao receber 429 ou falhar; nesses casos a chamada segue para o próximo.
+    Com LLM_HEDGE_PERCENTILE > 0, se o backend escolhido passar do percentil de latência
+    observado, uma cópia vai para o próximo backend e vale a primeira resposta.
+    """
+
+    def __init__(self, backends: List[LLMBackend], hedge_percentile: float = LLM_HEDGE_PERCENTILE):
+        self.backends = backends
+        self.hedge_percentile = hedge_percentile
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.backends)
+
+    @property
+    def primary(self) -> Optional[LLMBackend]:
+        return self.backends[0] if self.backends else None
+
+    def _decide(self, backend: LLMBackend, decision: str) -> None:
+        LLM_ROUTING.inc(backend=backend.name, decision=decision)
+
+    async def _pick(self, estimated_tokens: int, exclude: set) -> Optional[LLMBackend]:
+        """Primeiro backend com orçamento livre; se nenhum tiver, espera o mais próximo (até um limite)."""
+        candidates = [b for b in self.backends if b.name not in exclude]
+        for backend in candidates:
+            if backend.wait_time(estimated_tokens) == 0:
+                return backend
+            self._decide(backend, "sem_orcamento" if not backend.cooldown_remaining() else "em_backoff")
+
+        if not candidates:
+            return None
+        soonest = min(candidates, key=lambda b: b.wait_time(estimated_tokens))
+        wait = soonest.wait_time(estimated_tokens)
+        if wait > LLM_MAX_BUDGET_WAIT_SECONDS:
+            return None
+        await asyncio.sleep(wait)
+        return soonest
+
+    async def _call(self, backend: LLMBackend, estimated_tokens: int, kwargs: Dict[str, Any]) -> Any:
+        backend.reserve(estimated_tokens)
+        completion = await backend.complete(**kwargs)
+        usage = getattr(completion, "usage", None)
+        actual = getattr(usage, "total_tokens", None)
+        if actual:
+            backend.tokens.consume(actual - estimated_tokens)
+        return completion
+
+    def _record_failure(self, backend: LLMBackend, error: Exception) -> None:
+        """Backoff e contagem de falhas do backend que de fato falhou."""
+        status = _status_code(error)
+        if status == 429:
+            backend.rate_limited += 1
+            delay = backend.back_off(_retry_after(error))
+            self._decide(backend, "limite_429")
+            logger.warning(f"LLM: '{backend.name}' respondeu 429; backoff de {delay:.1f}s.")
+        elif status is not None and 400 <= status < 500:
+            # Erro da requisição (não do backend): sem backoff.
+            return
+        else:
+            delay = backend.back_off(None)
+            self._decide(backend, "falha")
+            logger.warning(f"LLM: falha em '{backend.name}' ({error}); backoff de {delay:.1f}s.")
+
+    async def _attempt(self, backend: LLMBackend, estimated_tokens: int, kwargs: Dict[str, Any]) -> Any:
+        try:
+            return await self._call(backend, estimated_tokens, kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._record_failure(backend, e)
+            raise
+
+    async def _call_hedged(self, backend: LLMBackend, estimated_tokens: int, kwargs: Dict[str, Any],
+                           tried: set) -> RoutedCompletion:
+        threshold = backend.latency_percentile(self.hedge_percentile) if self.hedge_percentile else None
+        primary_task = asyncio.ensure_future(self._attempt(backend, estimated_tokens, kwargs))
+        if threshold is None:
+            return RoutedCompletion(await primary_task, backend, backend is self.primary)
+
+        done, _ = await asyncio.wait({primary_task}, timeout=threshold)
+        if done:
+            return RoutedCompletion(primary_task.result(), backend, backend is self.primary)
+
+        hedge = next((b for b in self.backends if b.name not in tried and b.wait_time(estimated_tokens) == 0), None)
+        if hedge is None:
+            return RoutedCompletion(await primary_task, backend, backend is self.primary)
+
+        tried.add(hedge.name)
+        self.hedges += 1
+        self._decide(hedge, "hedge")
+        logger.info(f"LLM: '{backend.name}' passou de {threshold:.2f}s; enviando cópia para '{hedge.name}'.")
+        tasks = {primary_task: backend, asyncio.ensure_future(self._attempt(hedge, estimated_tokens, kwargs)): hedge}
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = tasks[task]
+                        if winner is hedge:
+                            self.hedge_wins += 1
+                            self._decide(hedge, "hedge_venceu")
+                        return RoutedCompletion(task.result(), winner, winner is self.primary)
+            # Os dois falharam (cada um já em backoff); o erro do backend escolhido decide o failover.
+            raise primary_task.exception()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def complete(self, messages: List[Dict[str, str]], **kwargs: Any) -> RoutedCompletion:
+        """Envia a conversa ao melhor backend disponível, com failover e hedging opcional."""
+        if not self.backends:
+            raise HTTPException(status_code=503, detail="Serviço indisponível: nenhum backend LLM configurado.")
+
+        estimated = _estimate_tokens(messages, kwargs.get("max_tokens"))
+        kwargs = {**kwargs, "messages": messages}
+        tried: set = set()
+        last_error: Optional[Exception] = None
+
+        while True:
+            backend = await self._pick(estimated, tried)
+            if backend is None:
+                break
+            tried.add(backend.name)
+            self._decide(backend, "principal" if backend is self.primary else "failover")
+            try:
+                return await self._call_hedged(backend, estimated, kwargs, tried)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Backoff e falhas já contabilizados em _attempt, no backend (ou hedge) que falhou.
+                last_error = e
+                status = _status_code(e)
+                if status is not None and 400 <= status < 500 and status != 429:
+                    # Erro da requisição (não do backend): outro provedor não resolveria.
+                    raise
+
+        retry_after = min((b.wait_time(estimated) for b in self.backends), default=LLM_BACKOFF_BASE_SECONDS)
+        if last_error is None or _status_code(last_error) == 429:
+            raise HTTPException(
+                status_code=429,
+                detail="Serviço sobrecarregado: limite dos backends LLM atingido.",
+                headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+            )
+        raise HTTPException(
+            status_code=503,
+            detail=f"Serviço indisponível: nenhum backend LLM respondeu ({last_error}).",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "order": [b.name for b in self.backends],
+            "hedge_percentile": self.hedge_percentile or None,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "backends": {b.name: b.stats() for b in self.backends},
+        }
@@ -0,0 +1,264 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Variáveis de Ambiente
+# 'request': só quando o cliente envia X-Debug-Timing: 1; 'always': em toda resposta; 'off': nunca.
+METRICS_TIMING_HEADER = os.getenv("METRICS_TIMING_HEADER", "request")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Tempos por estágio da requisição corrente, preenchidos por `timed` e lidos pelo middleware.
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(f"{self.name}_total", dict(zip(self.labelnames, k)), v) for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, k)), v) for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por combinação de labels: contagem por bucket (não cumulativa), soma e total.
+        self._values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> List[Sample]:
+        out: List[Sample] = []
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._values.items()]
+        for key, counts, total, count in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                out.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            out.append((f"{self.name}_sum", labels, total))
+            out.append((f"{self.name}_count", labels, count))
+        return out
+
+
+class Registry:
+    """Registro mínimo de métricas no formato texto do Prometheus.
+
+    Além das métricas próprias, aceita coletores que leem o estado de outros componentes
+    (caches, filas) só no momento do scrape, sem custo no caminho das requisições.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]] = []
+        # Labels acrescentados a toda amostra (ex.: worker=N no servidor pré-forkado).
+        self.constant_labels: Dict[str, str] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]) -> None:
+        self._collectors.append(collector)
+
+    def set_constant_labels(self, **labels: str) -> None:
+        self.constant_labels = {key: str(value) for key, value in labels.items()}
+
+    def render(self) -> str:
+        families = [(m.name, m.kind, m.documentation, m.samples()) for m in self._metrics]
+        for collector in self._collectors:
+            families.extend(collector())
+
+        lines = []
+        for name, kind, documentation, samples in families:
+            if kind == "counter" and not name.endswith("_total"):
+                # No formato texto 0.0.4 o TYPE usa o nome das amostras; sem o _total o
+                # Prometheus trata o contador como untyped.
+                name = f"{name}_total"
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                labels = {**self.constant_labels, **labels}
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "curadoria_stage_seconds", "Duração de cada estágio do pipeline.", ("stage",)))
+REQUEST_SECONDS = registry.register(Histogram(
+    "curadoria_request_seconds", "Duração das requisições HTTP.", ("method", "route", "status")))
+REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    "curadoria_requests_in_flight", "Requisições HTTP em andamento."))
+LLM_TOKENS = registry.register(Counter(
+    "curadoria_llm_tokens", "Tokens consumidos nas chamadas à LLM.", ("endpoint", "kind")))
+LLM_CALLS = registry.register(Counter(
+    "curadoria_llm_calls", "Chamadas à LLM.", ("endpoint", "outcome")))
+LLM_BACKEND_SECONDS = registry.register(Histogram(
+    "curadoria_llm_backend_seconds", "Latência das chamadas por backend LLM.", ("backend", "outcome")))
+LLM_ROUTING = registry.register(Counter(
+    "curadoria_llm_routing", "Decisões de roteamento entre backends LLM.", ("backend", "decision")))
+PDF_PAGES = registry.register(Histogram(
+    "curadoria_pdf_pages", "Páginas lidas por PDF extraído.", (), (1, 2, 3, 5, 10, 20, 50, 100)))
+TEXT_CHARS = registry.register(Histogram(
+    "curadoria_text_chars", "Tamanho do texto limpo enviado ao pipeline.", (),
+    (100, 500, 1000, 2500, 5000, 10000, 20000, 50000, 100000)))
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str):
+    """Mede um estágio e o acumula no histograma e no detalhamento da requisição corrente."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def record_llm_usage(endpoint: str, completion) -> None:
+    usage = getattr(completion, "usage", None)
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, endpoint=endpoint, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, endpoint=endpoint, kind="completion")
+
+
+def _server_timing(timings: Dict[str, float], total: float) -> bytes:
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que mede as requisições e, se pedido, devolve o cabeçalho Server-Timing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = {"code": 500}
+        want_header = METRICS_TIMING_HEADER == "always" or (
+            METRICS_TIMING_HEADER == "request" and (b"x-debug-timing", b"1") in scope.get("headers", [])
+        )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if want_header:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(timings, time.perf_counter() - started)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope.get("method", ""),
+                route=getattr(route, "path", None) or "unmatched",
+                status=str(status["code"]),
+            )
+            _request_timings.reset(token)
@@ -0,0 +1,108 @@
+import os
+import gc
+import time
+import signal
+import socket
+import logging
+from typing import Any, Callable, Dict, Optional
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+# Variáveis de Ambiente
+PREFORK_BACKLOG = int(os.getenv("PREFORK_BACKLOG", 2048))
+PREFORK_RESPAWN_DELAY_SECONDS = float(os.getenv("PREFORK_RESPAWN_DELAY_SECONDS", 1))
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(PREFORK_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app: Any, sock: socket.socket, worker: int, workers: int,
+                after_fork: Optional[Callable[[int, int], None]], log_level: str) -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if after_fork:
+        after_fork(worker, workers)
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(app: Any, host: str, port: int, workers: int, preload: Optional[Callable[[], Any]] = None,
+          after_fork: Optional[Callable[[int, int], None]] = None, log_level: str = "info") -> None:
+    """Servidor pré-forkado: carrega o app (e o que `preload` trouxer) uma vez e depois faz fork.
+
+    Os workers herdam o socket já aberto e as páginas do processo pai em copy-on-write,
+    então o modelo de embeddings e os SDKs ficam uma vez só na memória. O uvicorn com
+    `workers=N` usa spawn e cada worker carregaria tudo de novo. O processo pai só
+    supervisiona: repõe workers que morrem e repassa SIGTERM/SIGINT.
+
+    Depois do fork cada worker tem o próprio estado. Os limites por estágio
+    (MAX_CONCURRENT_*, MAX_QUEUED_PER_STAGE) e os orçamentos de RPM/TPM dos backends
+    LLM valem por worker, então o total do servidor é o configurado vezes `workers`.
+    Métricas e endpoints /*/stats também são por worker: cada requisição cai em um
+    worker qualquer. As amostras do /metrics levam o label `worker` para o Prometheus
+    separar as séries; o total do servidor sai de `sum without (worker) (...)`.
+    """
+    started = time.perf_counter()
+    if preload:
+        preload()
+    # Objetos do pai vão para a geração permanente do GC: as coletas nos workers não
+    # tocam neles, o que evita copiar as páginas só para atualizar o cabeçalho do GC.
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Pré-carga concluída em {time.perf_counter() - started:.2f}s; iniciando {workers} workers.")
+
+    sock = _bind(host, port)
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(worker: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(app, sock, worker, workers, after_fork, log_level)
+            except BaseException:
+                logger.exception(f"Worker {worker} encerrado com erro.")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = worker
+        logger.info(f"Worker {worker} iniciado (pid {pid}).")
+
+    def stop(signum: int, frame: Any) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for worker in range(workers):
+        spawn(worker)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        worker = children.pop(pid, None)
+        if worker is None:
+            continue
+        if not stopping:
+            logger.warning(f"Worker {worker} (pid {pid}) saiu com status {status}; reiniciando.")
+            time.sleep(PREFORK_RESPAWN_DELAY_SECONDS)
+            if not stopping:
+                spawn(worker)
+    sock.close()
+    logger.info("Servidor pré-forkado encerrado.")
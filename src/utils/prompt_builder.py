@@ -0,0 +1,222 @@
+import re
+import json
+import math
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from src.utils.prompts import CATEGORIZACAO_TOKEN_BUDGET, CURADORIA_TOKEN_BUDGET, curadoria_system_template
+
+# Estimativa de tokens sem depender de um tokenizador: ~4 caracteres por token no
+# texto científico em inglês/português que chega à LLM.
+CHARS_PER_TOKEN = 4
+
+# Trecho inicial (título, autores, periódico) tratado como a seção "front".
+FRONT_MAX_CHARS = 800
+PASSAGE_CHARS = 600
+SECTION_DECAY = 0.6
+
+# Títulos de seção procurados no texto limpo (sem quebras de linha). Um título só vale
+# quando seguido de palavra maiúscula ou número, para não confundir "Results show..."
+# com o início da seção. Variantes mais longas vêm antes para casarem primeiro.
+SECTION_PATTERNS: List[Tuple[str, str]] = [
+    ("results", r"RESULTS AND DISCUSSION|Results and [Dd]iscussion|RESULTADOS E DISCUSS[ÃA]O|Resultados e [Dd]iscuss[ãa]o"),
+    ("methods", r"MATERIA[LI]S? AND METHODS|Materia[li]s? and [Mm]ethods|MATERIA[LI]S? E M[ÉE]TODOS|Materia[li]s? e [Mm][ée]todos"
+                r"|METHODOLOGY|Methodology|METODOLOGIA|Metodologia|METHODS|Methods|EXPERIMENTAL"),
+    ("abstract", r"ABSTRACT|Abstract|SUMMARY|Summary|RESUMO|Resumo"),
+    ("keywords", r"KEY ?WORDS|Key ?words|Keywords|PALAVRAS-CHAVE|Palavras-chave"),
+    ("introduction", r"INTRODUCTION|Introduction|INTRODU[ÇC][ÃA]O|Introdu[çc][ãa]o|BACKGROUND|Background"),
+    ("results", r"RESULTS|Results|RESULTADOS|Resultados"),
+    ("discussion", r"DISCUSSION|Discussion|DISCUSS[ÃA]O|Discuss[ãa]o"),
+    ("conclusions", r"CONCLUSIONS?|Conclusions?|CONCLUS[ÕO]ES|Conclus[õo]es|CONCLUS[ÃA]O|Conclus[ãa]o|FINAL REMARKS|Final remarks"),
+    ("references", r"REFERENCES|References|REFER[ÊE]NCIAS( BIBLIOGR[ÁA]FICAS)?|Refer[êe]ncias( bibliogr[áa]ficas)?"
+                   r"|LITERATURE CITED|Literature [Cc]ited|BIBLIOGRAPHY|Bibliography"),
+    ("acknowledgements", r"ACKNOWLEDGE?MENTS?|Acknowledge?ments?|AGRADECIMENTOS|Agradecimentos"),
+]
+
+SECTION_RE = re.compile(
+    r"(?:^|(?<=[\s\.\:\]\)]))(?:\d{1,2}(?:\.\d)?\.?\s+|[IVX]{1,4}\.\s+)?(?:"
+    + "|".join(f"(?P<s{i}>{pattern})" for i, (_, pattern) in enumerate(SECTION_PATTERNS))
+    + r")\s*[\.:\-–]?\s+(?=[A-ZÀ-Ý0-9\(\[])"
+)
+
+SENTENCE_RE = re.compile(r"(?<=[\.\!\?])\s+(?=[A-ZÀ-Ý])")
+
+# Seções e termos úteis para cada coluna do esquema. O primeiro padrão que casar com o
+# nome normalizado da coluna decide; colunas desconhecidas usam DEFAULT_RULE.
+HeaderRule = Tuple[Dict[str, float], Tuple[str, ...]]
+
+HEADER_RULES: List[Tuple[str, HeaderRule]] = [
+    (r"t[íi]tulo|subt[íi]tulo|autor|ano\b|editora|institui|peri[óo]dico|volume|n[úu]mero|p[áa]ginas|doi|local",
+     ({"front": 3.0, "abstract": 0.5}, ())),
+    (r"palavras-chave", ({"keywords": 3.0, "abstract": 1.0, "front": 0.5}, ())),
+    (r"resumo", ({"abstract": 3.0, "conclusions": 1.0}, ())),
+    (r"tipo de (documento|trabalho)", ({"front": 1.5, "abstract": 1.0, "methods": 0.5}, ())),
+    (r"solo e regi[ãa]o",
+     ({"methods": 2.0, "abstract": 1.0, "results": 0.5},
+      ("solo", "soil", "clima", "climate", "região", "region", "latitude", "textura", "texture", "argil", "clay",
+       "precipita", "rainfall", "oxisol", "latossolo", "site", "área experimental"))),
+    (r"ferramentas|t[ée]cnicas",
+     ({"methods": 3.0, "abstract": 0.5},
+      ("método", "method", "análise", "analys", "determin", "measured", "medid", "espectro", "spectro",
+       "statistic", "estatíst", "anova", "delineamento", "design", "isotop", "15n", "cromatograf"))),
+    (r"nutrientes|fornecimento",
+     ({"methods": 1.5, "results": 2.0, "abstract": 1.0, "conclusions": 1.0},
+      ("nitrog", "fósforo", "phosph", "potáss", "potass", "cálcio", "calcium", "magnés", "magnes", "enxofre",
+       "sulfur", "boro", "boron", "zinc", "zinco", "copper", "cobre", "mangan", "nutrient", "nutrien",
+       "fertiliz", "adubaç", "fertirrig", "foliar", "calagem", "liming", "gesso", "gypsum", "dose", "rate"))),
+    (r"culturas",
+     ({"abstract": 2.0, "methods": 1.5, "front": 0.5},
+      ("citrus", "citros", "laranja", "orange", "limão", "lemon", "tangerin", "cana", "sugarcane", "cultivar", "variedade",
+       "rootstock", "porta-enxerto", "soja", "soybean", "milho", "maize", "café", "coffee"))),
+    (r"aprova[çc][ãa]o curador|feedback do curador",
+     ({"abstract": 2.0, "methods": 1.0, "results": 1.0, "conclusions": 2.0}, ())),
+]
+DEFAULT_RULE: HeaderRule = ({"abstract": 1.5, "results": 1.0, "conclusions": 1.0}, ())
+
+# Categorização: basta saber do que o artigo trata.
+CATEGORIZACAO_WEIGHTS = {"front": 2.0, "abstract": 3.0, "keywords": 2.5, "introduction": 0.5, "conclusions": 1.0}
+
+
+class Passage(NamedTuple):
+    start: int
+    section: str
+    text: str
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _normalize_header(header: str) -> str:
+    return header.strip().lower()
+
+
+def detect_sections(text: str) -> List[Tuple[int, str]]:
+    """Retorna (posição, seção) de cada título encontrado, precedidos pelo trecho inicial."""
+    sections = [(0, "front")]
+    for match in SECTION_RE.finditer(text):
+        index = next(int(name[1:]) for name, value in match.groupdict().items() if value)
+        sections.append((match.start(), SECTION_PATTERNS[index][0]))
+
+    # O trecho inicial não passa de FRONT_MAX_CHARS; o que vem depois, até o primeiro
+    # título, é tratado como corpo sem seção.
+    if len(sections) == 1 or sections[1][0] > FRONT_MAX_CHARS:
+        sections.insert(1, (min(FRONT_MAX_CHARS, len(text)), "body"))
+    return sections
+
+
+def split_passages(text: str) -> List[Passage]:
+    sections = detect_sections(text)
+    passages = []
+    for (start, section), (end, _) in zip(sections, sections[1:] + [(len(text), "")]):
+        chunk, chunk_start, offset = "", start, start
+        for sentence in SENTENCE_RE.split(text[start:end]):
+            if chunk and len(chunk) + len(sentence) > PASSAGE_CHARS:
+                passages.append(Passage(chunk_start, section, chunk.strip()))
+                chunk, chunk_start = "", offset
+            chunk += sentence + " "
+            offset += len(sentence) + 1
+        if chunk.strip():
+            passages.append(Passage(chunk_start, section, chunk.strip()))
+    return passages
+
+
+@lru_cache(maxsize=256)
+def header_weights(headers: Tuple[str, ...]) -> Tuple[Dict[str, float], Tuple[str, ...]]:
+    """Peso de cada seção e termos de interesse para um conjunto de colunas."""
+    weights: Dict[str, float] = {}
+    terms: List[str] = []
+    for header in headers:
+        normalized = _normalize_header(header)
+        section_weights, header_terms = next(
+            (rule for pattern, rule in HEADER_RULES if re.search(pattern, normalized)), DEFAULT_RULE
+        )
+        for section, weight in section_weights.items():
+            weights[section] = weights.get(section, 0.0) + weight
+        terms.extend(header_terms)
+    # Raiz da soma: muitas colunas de metadados não devem monopolizar o orçamento.
+    weights = {section: math.sqrt(weight) for section, weight in weights.items()}
+    return weights, tuple(dict.fromkeys(terms))
+
+
+def select_passages(text: str, weights: Dict[str, float], terms: Sequence[str], token_budget: int) -> str:
+    """Monta o trecho do documento enviado à LLM dentro do orçamento de tokens.
+
+    Textos que já cabem no orçamento vão inteiros. Nos demais, cada passagem recebe o
+    peso da sua seção, com bônus pelos termos de interesse encontrados; as melhores
+    entram até esgotar o orçamento e são reapresentadas na ordem do documento, com o
+    nome da seção quando ela muda.
+    """
+    budget_chars = token_budget * CHARS_PER_TOKEN
+    if len(text) <= budget_chars:
+        return text
+
+    passages = split_passages(text)
+    candidates = []
+    for position, passage in enumerate(passages):
+        weight = weights.get(passage.section, 0.0)
+        if passage.section == "body":
+            weight = max(weight, 0.25)
+        if weight <= 0:
+            continue
+        lowered = passage.text.lower()
+        hits = sum(1 for term in terms if term in lowered)
+        # Empate: passagens mais cedo na seção costumam resumir o resto.
+        candidates.append((weight * (1 + 0.1 * min(hits, 3)), -position, passage))
+
+    # Escolha gulosa com retorno decrescente por seção, para o orçamento não ir todo
+    # para a seção de maior peso (ex.: métodos) e deixar de fora título ou resumo.
+    chosen: List[Passage] = []
+    taken: Dict[str, int] = {}
+    used = 0
+    while candidates:
+        best = max(candidates, key=lambda c: (c[0] * SECTION_DECAY ** taken.get(c[2].section, 0), c[1]))
+        candidates.remove(best)
+        passage = best[2]
+        cost = len(passage.text) + len(passage.section) + 4
+        if used + cost > budget_chars:
+            continue
+        chosen.append(passage)
+        taken[passage.section] = taken.get(passage.section, 0) + 1
+        used += cost
+
+    if not chosen:
+        return text[:budget_chars]
+
+    parts, previous = [], None
+    for passage in sorted(chosen, key=lambda p: p.start):
+        if passage.section != previous:
+            parts.append(f"[{passage.section.upper()}] {passage.text}")
+            previous = passage.section
+        else:
+            parts.append(passage.text)
+    return "\n".join(parts)
+
+
+def curadoria_document_text(text: str, headers: Sequence[str], token_budget: int = CURADORIA_TOKEN_BUDGET) -> str:
+    weights, terms = header_weights(tuple(headers))
+    return select_passages(text, weights, terms, token_budget)
+
+
+def categorizacao_document_text(text: str, token_budget: int = CATEGORIZACAO_TOKEN_BUDGET) -> str:
+    return select_passages(text, CATEGORIZACAO_WEIGHTS, (), token_budget)
+
+
+FIELD_INSTRUCTION_RE = re.compile(r"^- \*\*(?P<field>.+?):\*\*")
+
+
+@lru_cache(maxsize=256)
+def compiled_system_prompt(category: Optional[str], headers: Tuple[str, ...]) -> str:
+    """Prompt de sistema da curadoria já com o esquema, cacheado por (categoria, colunas).
+
+    As instruções por campo ("- **Campo:** ...") de colunas que não estão no esquema são
+    omitidas, já que só gastariam tokens.
+    """
+    wanted = {_normalize_header(header) for header in headers}
+    lines = []
+    for line in curadoria_system_template(category).split("\n"):
+        match = FIELD_INSTRUCTION_RE.match(line)
+        if match and _normalize_header(match.group("field")) not in wanted:
+            continue
+        lines.append(line)
+    schema_str = json.dumps({header: "" for header in headers}, indent=2)
+    return "\n".join(lines).format(schema_str=schema_str)
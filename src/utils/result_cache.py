@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Variáveis de Ambiente
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB", os.path.join(".cache", "llm_results.db"))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", 30 * 24 * 3600))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Valores aceitos para o modo de cache por requisição.
+CACHE_MODES = ("use", "refresh", "bypass")
+
+# A eviction por tamanho percorre a tabela; roda a cada N gravações em vez de em todas.
+EVICT_EVERY_PUTS = 50
+
+# Conexões herdadas de um processo pai em workers pré-forkados: mantidas vivas para
+# nunca serem fechadas no filho.
+_INHERITED_CONNECTIONS: List[sqlite3.Connection] = []
+
+
+def normalize_headers(headers: List[str]) -> List[str]:
+    """Normaliza o esquema de colunas: sem espaços extras, sem repetição e em ordem estável."""
+    return sorted({h.strip() for h in headers if h and h.strip()})
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def result_key(endpoint: str, document_hash: str, category: Optional[str], headers: List[str],
+               model: str, prompt_version: str) -> str:
+    material = json.dumps(
+        [endpoint, document_hash, category or "", normalize_headers(headers), model, prompt_version],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Cache durável (SQLite) das respostas da LLM para /curadoria e /categorize.
+
+    Entradas expiram após `ttl` segundos e, acima de `max_bytes`, as menos acessadas
+    recentemente são removidas. A versão dos prompts fica gravada em cada linha para
+    permitir descartar o que foi gerado com templates antigos.
+    """
+
+    def __init__(self, path: Optional[str] = RESULT_CACHE_DB, ttl: int = RESULT_CACHE_TTL_SECONDS,
+                 max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._connect()
+
+    def _connect(self) -> None:
+        if self.path:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS llm_results (
+                        key TEXT PRIMARY KEY,
+                        endpoint TEXT NOT NULL,
+                        model TEXT NOT NULL,
+                        prompt_version TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                """)
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_results_accessed ON llm_results (accessed_at)")
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Erro ao abrir cache de respostas da LLM: {e}")
+                self._conn = None
+
+    def reopen(self) -> None:
+        """Abre uma conexão própria após um fork. A herdada do processo pai não é usada
+        nem fechada (o SQLite não suporta conexões atravessando fork)."""
+        if self._conn is not None:
+            _INHERITED_CONNECTIONS.append(self._conn)
+        self._conn = None
+        self._lock = threading.Lock()
+        self._connect()
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self._conn:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM llm_results WHERE key = ?", (key,))
+                self._conn.commit()
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_results SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(value)
+
+    def put(self, key: str, value: Any, endpoint: str, model: str, prompt_version: str) -> None:
+        if not self._conn:
+            return
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, endpoint, model, prompt_version, data, len(data.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+            self._puts += 1
+            if self._puts % EVICT_EVERY_PUTS == 0:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Remove expirados e, se preciso, as entradas menos acessadas (com o lock adquirido)."""
+        cursor = self._conn.execute("DELETE FROM llm_results WHERE created_at < ?", (time.time() - self.ttl,))
+        self.expired += cursor.rowcount
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_results").fetchone()[0]
+        if total > self.max_bytes:
+            excess = total - self.max_bytes
+            freed = 0
+            victims = []
+            for key, size in self._conn.execute("SELECT key, size FROM llm_results ORDER BY accessed_at ASC"):
+                victims.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            self._conn.executemany("DELETE FROM llm_results WHERE key = ?", victims)
+            self.evictions += len(victims)
+        self._conn.commit()
+
+    def invalidate(self, prompt_version: Optional[str] = None, keep_current: bool = False) -> int:
+        """Apaga entradas: todas, as de uma versão de prompt ou, com keep_current, as de versões diferentes."""
+        if not self._conn:
+            return 0
+        with self._lock:
+            if prompt_version is None:
+                cursor = self._conn.execute("DELETE FROM llm_results")
+            elif keep_current:
+                cursor = self._conn.execute("DELETE FROM llm_results WHERE prompt_version != ?", (prompt_version,))
+            else:
+                cursor = self._conn.execute("DELETE FROM llm_results WHERE prompt_version = ?", (prompt_version,))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        entries, size = 0, 0
+        if self._conn:
+            with self._lock:
+                entries, size = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_results"
+                ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,129 @@
+import os
+import time
+import asyncio
+import logging
+import importlib
+import resource
+import threading
+from typing import Any, Callable, Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Variáveis de Ambiente
+# 'lazy': SDKs e modelo carregados no primeiro uso; 'warm': carregados logo após o startup,
+# com /health/ready respondendo 503 até o warm-up terminar.
+STARTUP_MODE = os.getenv(
+    "STARTUP_MODE", "warm" if os.getenv("EMBEDDING_WARMUP", "false").lower() == "true" else "lazy"
+)
+
+
+class LazyResource:
+    """Recurso caro (ex.: cliente de SDK) criado no primeiro uso ou no warm-up.
+
+    Os imports pesados ficam dentro da fábrica; `modules` lista os módulos que podem ser
+    importados antes do fork dos workers sem criar conexões ou threads.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], modules: Sequence[str] = ()):
+        self.name = name
+        self.modules = tuple(modules)
+        self._factory = factory
+        self._value: Any = None
+        self._lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._value is not None
+
+    def import_modules(self) -> None:
+        for module in self.modules:
+            importlib.import_module(module)
+
+    def get(self) -> Any:
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    started = time.perf_counter()
+                    try:
+                        self._value = self._factory()
+                    except Exception as e:
+                        self.error = str(e)
+                        raise
+                    self.error = None
+                    self.load_seconds = round(time.perf_counter() - started, 3)
+                    logger.info(f"{self.name} carregado em {self.load_seconds}s")
+        return self._value
+
+    async def aget(self) -> Any:
+        """Como `get`, mas a primeira criação roda fora do event loop."""
+        if self._value is not None:
+            return self._value
+        return await asyncio.to_thread(self.get)
+
+    def reset(self) -> None:
+        """Descarta a instância herdada do processo pai após um fork.
+
+        Conexões e threads do cliente do pai não valem no filho; o lock também é recriado,
+        já que uma thread do pai pode tê-lo deixado preso no momento do fork.
+        """
+        self._lock = threading.Lock()
+        self._value = None
+        self.load_seconds = None
+        self.error = None
+
+    def status(self) -> Dict[str, Any]:
+        return {"loaded": self.loaded, "load_seconds": self.load_seconds, "error": self.error}
+
+
+class StartupState:
+    """Situação do processo para as sondas de liveness e readiness."""
+
+    def __init__(self, mode: str = STARTUP_MODE):
+        self.mode = mode
+        self.started_at = time.time()
+        self.worker: Optional[int] = None
+        self.warmup = "pending" if mode == "warm" else "skipped"
+        self.warmup_seconds: Dict[str, float] = {}
+        self.error: Optional[str] = None
+
+    def forked(self, worker: int) -> None:
+        self.started_at = time.time()
+        self.worker = worker
+        self.warmup = "pending" if self.mode == "warm" else "skipped"
+        self.warmup_seconds = {}
+        self.error = None
+
+    @property
+    def warm(self) -> bool:
+        return self.warmup in ("done", "skipped")
+
+    def uptime(self) -> float:
+        return round(time.time() - self.started_at, 3)
+
+
+startup_state = StartupState()
+
+
+def process_memory(pid: Any = "self") -> Dict[str, float]:
+    """Memória do processo em MB: RSS, PSS e a parte compartilhada/privada (smaps_rollup, só Linux).
+
+    O PSS divide as páginas compartilhadas entre os processos que as mapeiam, então a
+    soma do PSS dos workers mostra quanto o copy-on-write realmente economiza.
+    """
+    fields = {"Rss": "rss_mb", "Pss": "pss_mb", "Shared_Clean": "shared_mb", "Shared_Dirty": "shared_mb",
+              "Private_Clean": "private_mb", "Private_Dirty": "private_mb"}
+    memory: Dict[str, float] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in fields:
+                    key = fields[name]
+                    memory[key] = memory.get(key, 0.0) + int(rest.split()[0]) / 1024
+    except OSError:
+        if pid == "self":
+            # Fora do Linux só há o pico de RSS (em KB no Linux, em bytes no macOS).
+            memory["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {key: round(value, 1) for key, value in memory.items()}
@@ -0,0 +1,205 @@
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Variáveis de Ambiente
+TEXT_CACHE_DIR = os.getenv("TEXT_CACHE_DIR", os.path.join(".cache", "text"))
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", 64 * 1024 * 1024))  # LRU em memória
+TEXT_CACHE_DISK_MAX_BYTES = int(os.getenv("TEXT_CACHE_DISK_MAX_BYTES", 1024 * 1024 * 1024))  # cópia em disco
+
+# Ao passar do limite em disco, apaga os arquivos mais antigos (mtime) até esta fração dele,
+# para não varrer o diretório a cada gravação seguinte.
+DISK_EVICT_TARGET = 0.9
+
+# Versão da extração: altere quando a lógica de get_document_text/clean_text_for_llm mudar,
+# para que textos antigos em disco não sejam reaproveitados.
+EXTRACTION_VERSION = "v1"
+
+
+def content_hasher(content_type: str) -> "hashlib._Hash":
+    """Hash incremental para documentos recebidos em blocos (uploads em streaming)."""
+    h = hashlib.sha256()
+    h.update(f"{EXTRACTION_VERSION}:{content_type}:".encode("utf-8"))
+    return h
+
+
+def content_hash(data: bytes, content_type: str) -> str:
+    """Gera a chave do cache a partir dos bytes decodificados do documento."""
+    h = content_hasher(content_type)
+    h.update(data)
+    return h.hexdigest()
+
+
+def file_content_hash(path: str, content_type: str, chunk_size: int = 1024 * 1024) -> str:
+    """Gera a chave do cache de um arquivo em disco, lendo-o em blocos."""
+    h = content_hasher(content_type)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class TextCache:
+    """Cache de texto extraído endereçado por conteúdo.
+
+    Mantém os textos limpos em memória com despejo LRU limitado pelo tamanho total
+    e persiste cada entrada em disco, sobrevivendo a reinícios do serviço. O disco tem
+    limite próprio: leituras renovam o mtime do arquivo e, ao passar do limite, os
+    arquivos menos usados são apagados.
+    """
+
+    def __init__(self, directory: Optional[str] = TEXT_CACHE_DIR, max_bytes: int = TEXT_CACHE_MAX_BYTES,
+                 disk_max_bytes: int = TEXT_CACHE_DISK_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._disk_size = 0
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        if self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                self._disk_size = sum(size for _, size, _ in self._disk_files())
+            except OSError as e:
+                logger.error(f"Erro ao criar diretório do cache de texto: {e}")
+                self.directory = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.txt")
+
+    def _disk_files(self) -> List[Tuple[float, int, str]]:
+        """(mtime, tamanho, caminho) de cada entrada gravada em disco."""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(".txt"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def _evict_disk(self) -> None:
+        """Apaga os arquivos mais antigos até DISK_EVICT_TARGET do limite.
+
+        O diretório pode ser compartilhado com outros workers, então o tamanho real é
+        recontado aqui em vez de confiar só no contador deste processo.
+        """
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        target = self.disk_max_bytes * DISK_EVICT_TARGET
+        removed = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Erro ao remover cache de texto em disco: {e}")
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._disk_size = total
+            self.disk_evictions += removed
+        if removed:
+            logger.info(f"Cache de texto em disco: {removed} arquivos antigos removidos.")
+
+    def _remember(self, key: str, text: str) -> None:
+        """Insere no LRU em memória (deve ser chamado com o lock adquirido)."""
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old.encode("utf-8"))
+        self._entries[key] = text
+        self._size += size
+        while self._size > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted.encode("utf-8"))
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return text
+
+        if self.directory:
+            try:
+                path = self._path(key)
+                with open(path, "r", encoding="utf-8") as f:
+                    text = f.read()
+                # Renova o mtime: a remoção por tamanho apaga primeiro o que não é lido há mais tempo.
+                os.utime(path)
+                with self._lock:
+                    self._remember(key, text)
+                    self.hits += 1
+                    self.disk_hits += 1
+                return text
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Erro ao ler cache de texto em disco: {e}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, text: str) -> None:
+        with self._lock:
+            self._remember(key, text)
+
+        if self.directory:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(text)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.error(f"Erro ao gravar cache de texto em disco: {e}")
+                return
+            with self._lock:
+                self._disk_size += len(text.encode("utf-8"))
+                over_limit = self._disk_size > self.disk_max_bytes
+            if over_limit:
+                self._evict_disk()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "memory_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "disk_bytes": self._disk_size,
+                "disk_max_bytes": self.disk_max_bytes,
+                "disk_evictions": self.disk_evictions,
+            }
@@ -0,0 +1,270 @@
+import os
+import json
+import logging
+import asyncio
+import tempfile
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional
+from fastapi import HTTPException, Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+from src.utils.result_cache import CACHE_MODES
+from src.utils.text_cache import content_hasher, file_content_hash
+
+logger = logging.getLogger(__name__)
+
+# Variáveis de Ambiente
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 200 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Campos do formulário que não são o arquivo (headers, category...) ficam em memória.
+UPLOAD_MAX_FIELD_BYTES = 64 * 1024
+
+RAW_CONTENT_TYPES = {
+    "application/pdf": "pdf",
+    "application/octet-stream": "pdf",
+    "text/plain": "text",
+}
+
+
+class SpooledUpload:
+    """Documento recebido em streaming e gravado em um arquivo temporário.
+
+    O hash do conteúdo é calculado bloco a bloco durante a gravação, então o corpo
+    da requisição nunca fica inteiro na memória.
+    """
+
+    def __init__(self, path: str, key: str, content_type: str):
+        self.path = path
+        self.key = key
+        self.content_type = content_type
+
+    def cleanup(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Erro ao remover upload temporário: {e}")
+
+
+class _SpoolWriter:
+    """Grava blocos em um arquivo temporário, calculando o hash e validando o tamanho."""
+
+    def __init__(self, content_type: str):
+        self.content_type = content_type
+        self.hasher = content_hasher(content_type)
+        self.size = 0
+        fd, self.path = tempfile.mkstemp(prefix="upload-", suffix=f".{content_type}", dir=UPLOAD_TMP_DIR)
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > UPLOAD_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Arquivo excede o tamanho máximo permitido.")
+        self.hasher.update(chunk)
+        self._file.write(chunk)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def abort(self) -> None:
+        self.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def finish(self) -> SpooledUpload:
+        self.close()
+        if self.size == 0:
+            self.abort()
+            raise HTTPException(status_code=400, detail="Arquivo vazio.")
+        return SpooledUpload(self.path, self.hasher.hexdigest(), self.content_type)
+
+
+async def spool_chunks(chunks: AsyncIterator[bytes], content_type: str) -> SpooledUpload:
+    """Grava os blocos recebidos em disco, calculando o hash e validando o tamanho."""
+    writer = _SpoolWriter(content_type)
+    try:
+        async for chunk in chunks:
+            if chunk:
+                writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.finish()
+
+
+class UploadRequest(NamedTuple):
+    upload: SpooledUpload
+    headers: List[str]
+    category: Optional[str]
+    cache_mode: str
+
+
+def _parse_headers_field(values: List[str]) -> List[str]:
+    """Aceita tanto campos repetidos quanto um único campo com uma lista JSON."""
+    if len(values) == 1 and values[0].strip().startswith("["):
+        try:
+            parsed = json.loads(values[0])
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Campo 'headers' não é uma lista JSON válida.")
+        return [str(h) for h in parsed]
+    return [v for v in values if v]
+
+
+def _validate_options(content_type: str, cache_mode: str) -> None:
+    """Valida as opções antes de gravar o corpo: o tipo também vira o sufixo do arquivo temporário."""
+    if content_type not in ("pdf", "text"):
+        raise HTTPException(status_code=400, detail=f"Tipo de conteúdo desconhecido: {content_type}")
+    if cache_mode not in CACHE_MODES:
+        raise HTTPException(status_code=400, detail=f"Modo de cache inválido: {cache_mode}")
+
+
+class _MultipartSpool:
+    """Lê um corpo multipart/form-data em streaming: a parte 'file' vai direto para um
+    arquivo temporário e os demais campos ficam em memória.
+
+    Sem o `request.form()` do Starlette, que gravaria o arquivo no seu próprio temporário
+    antes de o copiarmos de novo. Campos enviados antes do arquivo (ex.: 'content_type')
+    já valem para ele; os que chegam depois são conferidos no final.
+    """
+
+    def __init__(self, boundary: bytes):
+        self.fields: Dict[str, List[str]] = defaultdict(list)
+        self.writer: Optional[_SpoolWriter] = None
+        self.file_seen = False
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._name: Optional[str] = None
+        self._buffer: Optional[bytearray] = None
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+        self._name = None
+        self._buffer = None
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        if self._name != "file":
+            self._buffer = bytearray()
+            return
+        if self.file_seen:
+            raise HTTPException(status_code=400, detail="Mais de um campo 'file' no formulário.")
+        self.file_seen = True
+        part_type = self._headers.get(b"content-type", b"").decode("latin-1").lower()
+        content_type = self.field("content_type") or ("text" if part_type.startswith("text/") else "pdf")
+        _validate_options(content_type, self.field("cache_mode") or "use")
+        self.writer = _SpoolWriter(content_type)
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._name == "file":
+            self.writer.write(data[start:end])
+        elif self._buffer is not None:
+            self._buffer += data[start:end]
+            if len(self._buffer) > UPLOAD_MAX_FIELD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Campo '{self._name}' excede o tamanho máximo.")
+
+    def _on_part_end(self) -> None:
+        if self._name == "file":
+            self.writer.close()
+        elif self._buffer is not None and self._name:
+            self.fields[self._name].append(self._buffer.decode("utf-8", "replace"))
+        self._name = None
+        self._buffer = None
+
+    def field(self, name: str) -> Optional[str]:
+        values = self.fields.get(name)
+        return values[0] if values else None
+
+    async def read(self, chunks: AsyncIterator[bytes]) -> None:
+        try:
+            async for chunk in chunks:
+                if chunk:
+                    self._parser.write(chunk)
+            self._parser.finalize()
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self) -> None:
+        if self.writer:
+            self.writer.abort()
+
+
+async def _read_multipart(request: Request, media_options: Dict[bytes, bytes]) -> UploadRequest:
+    boundary = media_options.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Requisição multipart sem 'boundary'.")
+    form = _MultipartSpool(boundary)
+    await form.read(request.stream())
+    if form.writer is None:
+        raise HTTPException(status_code=400, detail="Campo 'file' ausente no formulário.")
+
+    try:
+        headers = _parse_headers_field(form.fields.get("headers", []))
+        category = form.field("category") or None
+        cache_mode = form.field("cache_mode") or "use"
+        content_type = form.field("content_type") or form.writer.content_type
+        _validate_options(content_type, cache_mode)
+        upload = form.writer.finish()
+    except BaseException:
+        form.abort()
+        raise
+
+    if content_type != upload.content_type:
+        # 'content_type' veio depois do arquivo: a chave do cache depende do tipo, então
+        # o hash é refeito a partir do disco (caso raro; clientes costumam enviá-lo antes).
+        try:
+            upload.key = await asyncio.to_thread(file_content_hash, upload.path, content_type)
+        except BaseException:
+            upload.cleanup()
+            raise
+        upload.content_type = content_type
+    return UploadRequest(upload, headers, category, cache_mode)
+
+
+async def read_upload_request(request: Request) -> UploadRequest:
+    """Lê uma requisição multipart (campo 'file') ou com o PDF/texto cru no corpo.
+
+    Em multipart, 'headers', 'category', 'content_type' e 'cache_mode' vêm como campos do
+    formulário; no corpo cru, como parâmetros de query e o tipo é inferido do Content-Type.
+    Nos dois casos o documento é gravado uma única vez, direto do stream da requisição.
+    """
+    media_type, media_options = parse_options_header(request.headers.get("content-type", ""))
+    media_type = media_type.decode("latin-1").strip().lower()
+
+    if media_type == "multipart/form-data":
+        return await _read_multipart(request, media_options)
+
+    content_type = request.query_params.get("content_type") or RAW_CONTENT_TYPES.get(media_type)
+    if not content_type:
+        raise HTTPException(status_code=415, detail=f"Tipo de mídia não suportado: {media_type or 'ausente'}")
+    headers = _parse_headers_field(request.query_params.getlist("headers"))
+    category = request.query_params.get("category") or None
+    cache_mode = request.query_params.get("cache_mode") or "use"
+    _validate_options(content_type, cache_mode)
+    spooled = await spool_chunks(request.stream(), content_type)
+    return UploadRequest(spooled, headers, category, cache_mode)
@@ -0,0 +1,225 @@
+import os
+import sys
+import json
+import glob
+import hashlib
+import logging
+import argparse
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Variáveis de Ambiente
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join(".cache", "vector_index"))
+VECTOR_INDEX_DTYPE = os.getenv("VECTOR_INDEX_DTYPE", "float32")  # 'float32' ou 'int8'
+
+CHUNK_CHARS = 1000
+CHUNK_OVERLAP = 200
+SEARCH_BLOCK_ROWS = 65536
+
+
+def chunk_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Divide o texto em janelas de tamanho fixo com sobreposição."""
+    if not text:
+        return []
+    step = max(1, size - overlap)
+    return [text[i:i + size] for i in range(0, max(len(text) - overlap, 1), step)]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantização int8 simétrica por vetor; retorna os valores e a escala de cada linha."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+class LocalVectorIndex:
+    """Índice vetorial embarcado: matriz de embeddings mapeada em memória + payloads em JSONL.
+
+    Os vetores são normalizados, então o produto escalar equivale à similaridade de cosseno.
+    Em modo int8 cada linha guarda uma escala float32 e ocupa 1/4 do espaço.
+    """
+
+    def __init__(self, directory: str = VECTOR_INDEX_DIR, dtype: str = VECTOR_INDEX_DTYPE):
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"Tipo de vetor desconhecido: {dtype}")
+        self.directory = directory
+        self._lock = threading.Lock()
+        self.dim: Optional[int] = None
+        self.dtype = dtype
+        self.model: Optional[str] = None
+        self.count = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._payloads: List[Dict[str, Any]] = []
+        self._sources: set = set()
+        self._load()
+
+    # --- arquivos ---
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, "meta.json")
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.directory, f"vectors.{self.dtype}")
+
+    @property
+    def _scales_path(self) -> str:
+        return os.path.join(self.directory, "scales.float32")
+
+    @property
+    def _payloads_path(self) -> str:
+        return os.path.join(self.directory, "payloads.jsonl")
+
+    def _load(self) -> None:
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dim = meta["dim"]
+        self.dtype = meta["dtype"]
+        self.model = meta.get("model")
+
+        with open(self._payloads_path, "r", encoding="utf-8") as f:
+            self._payloads = [json.loads(line) for line in f if line.strip()]
+        self._sources = {p.get("source_hash") for p in self._payloads if p.get("source_hash")}
+        self._remap(meta["count"])
+
+    def _remap(self, count: int) -> None:
+        self.count = count
+        if count == 0:
+            self._matrix = None
+            self._scales = None
+            return
+        np_dtype = np.int8 if self.dtype == "int8" else np.float32
+        self._matrix = np.memmap(self._vectors_path, dtype=np_dtype, mode="r", shape=(count, self.dim))
+        if self.dtype == "int8":
+            self._scales = np.memmap(self._scales_path, dtype=np.float32, mode="r", shape=(count,))
+
+    def _write_meta(self) -> None:
+        tmp_path = f"{self._meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype, "model": self.model, "count": self.count}, f)
+        os.replace(tmp_path, self._meta_path)
+
+    # --- API ---
+
+    def __len__(self) -> int:
+        return self.count
+
+    def has_source(self, source_hash: str) -> bool:
+        return source_hash in self._sources
+
+    def append(self, vectors: np.ndarray, payloads: List[Dict[str, Any]], model: Optional[str] = None) -> None:
+        """Acrescenta vetores ao final do índice sem reescrever o que já existe."""
+        if len(vectors) != len(payloads):
+            raise ValueError("Quantidade de vetores e payloads difere.")
+        if len(payloads) == 0:
+            return
+        vectors = _normalize(vectors)
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self.model = model
+                os.makedirs(self.directory, exist_ok=True)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Dimensão {vectors.shape[1]} incompatível com o índice ({self.dim}).")
+
+            if self.dtype == "int8":
+                quantized, scales = _quantize(vectors)
+                with open(self._vectors_path, "ab") as f:
+                    f.write(quantized.tobytes())
+                with open(self._scales_path, "ab") as f:
+                    f.write(scales.tobytes())
+            else:
+                with open(self._vectors_path, "ab") as f:
+                    f.write(vectors.tobytes())
+
+            with open(self._payloads_path, "a", encoding="utf-8") as f:
+                for payload in payloads:
+                    f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+
+            self._payloads.extend(payloads)
+            self._sources.update(p.get("source_hash") for p in payloads if p.get("source_hash"))
+            self._remap(self.count + len(payloads))
+            self._write_meta()
+
+    def search(self, query_vector: np.ndarray, limit: int = 3) -> List[Tuple[float, Dict[str, Any]]]:
+        """Top-k por similaridade de cosseno, percorrendo a matriz em blocos."""
+        with self._lock:
+            matrix, scales, count, payloads = self._matrix, self._scales, self.count, self._payloads
+        if matrix is None or count == 0:
+            return []
+
+        query = _normalize(query_vector)[0]
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            block = matrix[start:start + SEARCH_BLOCK_ROWS]
+            if scales is not None:
+                scores[start:start + len(block)] = (block.astype(np.float32) @ query) * scales[start:start + len(block)]
+            else:
+                scores[start:start + len(block)] = block @ query
+
+        k = min(limit, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), payloads[i]) for i in top]
+
+
+def build_index(source_dir: str, pattern: str, directory: str, model_name: str,
+                dtype: str = VECTOR_INDEX_DTYPE, batch_size: int = 64) -> LocalVectorIndex:
+    """Indexa (incrementalmente) os arquivos de texto do acervo com o modelo de embeddings."""
+    from sentence_transformers import SentenceTransformer
+
+    index = LocalVectorIndex(directory, dtype)
+    encoder = SentenceTransformer(model_name)
+    added = 0
+
+    for path in sorted(glob.glob(os.path.join(source_dir, pattern))):
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            text = " ".join(f.read().split())
+        source_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if not text or index.has_source(source_hash):
+            continue
+
+        chunks = chunk_text(text)
+        vectors = encoder.encode(chunks, batch_size=batch_size, convert_to_numpy=True)
+        source = os.path.basename(path)
+        index.append(vectors, [
+            {"text": chunk, "source": source, "source_hash": source_hash, "chunk": i}
+            for i, chunk in enumerate(chunks)
+        ], model=model_name)
+        added += len(chunks)
+        logger.info(f"Indexado {source}: {len(chunks)} trechos")
+
+    logger.info(f"Índice local em {directory}: {len(index)} vetores ({added} novos)")
+    return index
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Constrói o índice vetorial local a partir do acervo.")
+    parser.add_argument("--source", default=os.path.join("documents", "aprovados"))
+    parser.add_argument("--pattern", default="*.txt")
+    parser.add_argument("--output", default=VECTOR_INDEX_DIR)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--dtype", choices=["float32", "int8"], default=VECTOR_INDEX_DTYPE)
+    args = parser.parse_args()
+
+    index = build_index(args.source, args.pattern, args.output, args.model, args.dtype)
+    sys.exit(0 if len(index) else 1)
@@ -0,0 +1,115 @@
+import os
+import random
+import numpy as np
+import pytest
+from src.utils.dedup import (NUM_PERM, BANDS, DuplicateIndex, LSHBuckets, _shingle_hashes, estimate_similarity,
+                             find_clusters, minhash_signature)
+
+ROWS = NUM_PERM // BANDS
+
+
+def _text(seed: int, words: int = 400) -> str:
+    rng = random.Random(seed)
+    vocabulary = [f"palavra{i}" for i in range(2000)]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def _jaccard(a: str, b: str) -> float:
+    sa, sb = set(_shingle_hashes(a).tolist()), set(_shingle_hashes(b).tolist())
+    return len(sa & sb) / len(sa | sb)
+
+
+def _changed(signature: np.ndarray, positions: int) -> np.ndarray:
+    """Cópia com as primeiras `positions` posições alteradas (as últimas faixas continuam iguais)."""
+    other = signature.copy()
+    other[:positions] += np.uint64(1)
+    return other
+
+
+def test_signature_is_deterministic_and_case_insensitive():
+    text = _text(1)
+    a = minhash_signature(text)
+    assert a.shape == (NUM_PERM,)
+    assert np.array_equal(a, minhash_signature(text.upper()))
+
+
+def test_signature_of_text_without_words_is_none():
+    assert minhash_signature("") is None
+    assert minhash_signature("  --- ... ") is None
+
+
+def test_similarity_estimates_jaccard_of_shingles():
+    original = _text(1)
+    words = original.split()
+    words[100:110] = ["trocada"] * 10
+    edited = " ".join(words)
+
+    estimate = estimate_similarity(minhash_signature(original), minhash_signature(edited))
+    assert estimate == pytest.approx(_jaccard(original, edited), abs=0.1)
+    assert estimate_similarity(minhash_signature(original), minhash_signature(_text(2))) < 0.1
+
+
+@pytest.mark.parametrize("positions, expected", [
+    (0, True),
+    (int(NUM_PERM * 0.15), True),       # 109/128 ≈ 0,852: no limiar
+    (int(NUM_PERM * 0.15) + 1, False),  # 108/128 ≈ 0,844: abaixo
+])
+def test_lsh_query_applies_threshold_on_full_signature(positions, expected):
+    base = minhash_signature(_text(1))
+    lsh = LSHBuckets(threshold=0.85)
+    lsh.add("original", base)
+    matches = lsh.query(_changed(base, positions))
+    assert bool(matches) is expected
+    if expected:
+        assert matches[0] == ("original", pytest.approx((NUM_PERM - positions) / NUM_PERM))
+
+
+def test_lsh_needs_a_shared_band_to_find_candidates():
+    base = minhash_signature(_text(1))
+    lsh = LSHBuckets(threshold=0.0)
+    lsh.add("original", base)
+    # Uma posição diferente em cada faixa: nenhuma faixa colide, mesmo com Jaccard ~0,75.
+    other = base.copy()
+    other[::ROWS] += np.uint64(1)
+    assert lsh.query(other) == []
+
+
+def test_lsh_orders_matches_and_excludes_the_document_itself():
+    base = minhash_signature(_text(1))
+    lsh = LSHBuckets(threshold=0.5)
+    lsh.add("igual", base)
+    lsh.add("parecido", _changed(base, 10))
+    assert not lsh.add("igual", base)
+    assert [doc for doc, _ in lsh.query(base)] == ["igual", "parecido"]
+    assert [doc for doc, _ in lsh.query(base, exclude="igual")] == ["parecido"]
+
+
+def test_duplicate_index_persists_and_sees_other_writers(tmp_path):
+    path = str(tmp_path / "dedup.db")
+    signature = minhash_signature(_text(1))
+    writer, reader = DuplicateIndex(path), DuplicateIndex(path)
+    writer.add("doc", signature, "artigo.pdf")
+
+    # Outro worker com o mesmo arquivo enxerga a assinatura na consulta seguinte.
+    assert reader.find("novo", signature) == [("doc", "artigo.pdf", 1.0)]
+    assert reader.find("doc", signature) == []
+    assert len(DuplicateIndex(path)) == 1
+
+
+def test_find_clusters_picks_the_original_without_copy_suffix(tmp_path):
+    signature = minhash_signature(_text(1))
+    copy = str(tmp_path / "artigo (1).pdf")
+    original = str(tmp_path / "artigo.pdf")
+    clusters = find_clusters({copy: signature, original: _changed(signature, 4),
+                              str(tmp_path / "outro.pdf"): minhash_signature(_text(2))})
+    assert clusters == [{"original": original, "duplicates": [{"path": copy, "similarity": 0.969}]}]
+
+
+def test_find_clusters_prefers_the_oldest_file(tmp_path):
+    signature = minhash_signature(_text(1))
+    older, newer = tmp_path / "b.pdf", tmp_path / "a.pdf"
+    for path, mtime in ((older, 1_000), (newer, 2_000)):
+        path.write_bytes(b"")
+        os.utime(path, (mtime, mtime))
+    clusters = find_clusters({str(newer): signature, str(older): signature})
+    assert clusters[0]["original"] == str(older)
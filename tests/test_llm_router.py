@@ -0,0 +1,181 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from src.utils import llm_router
+from src.utils.llm_router import LLMBackend, LLMRouter, TokenBucket
+from src.utils.startup import LazyResource
+
+MESSAGES = [{"role": "user", "content": "x" * 40}]
+
+
+class APIError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers={"retry-after": retry_after} if retry_after else {})
+
+
+class FakeClient:
+    """Cliente no formato do SDK: `chat.completions.create` com atraso e erro configuráveis."""
+
+    def __init__(self, delay=0.0, error=None, total_tokens=None):
+        self.delay = delay
+        self.error = error
+        self.total_tokens = total_tokens
+        self.calls = 0
+        self.cancelled = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, model, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        return SimpleNamespace(model=model, usage=SimpleNamespace(total_tokens=self.total_tokens))
+
+
+def _backend(name, client, **kwargs):
+    return LLMBackend(name, LazyResource(name, lambda: client), f"modelo-{name}", **kwargs)
+
+
+def _complete(router, **kwargs):
+    return asyncio.run(router.complete(MESSAGES, max_tokens=10, **kwargs))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_router.time, "monotonic", clock)
+    return clock
+
+
+def test_token_bucket_waits_and_refills(clock):
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.wait_time(60) == 0
+    bucket.consume(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now += 30
+    assert bucket.snapshot() == 30
+    # Pedidos maiores que a capacidade esperam só até o balde encher.
+    assert bucket.wait_time(1000) == pytest.approx(30.0)
+    assert TokenBucket(0).wait_time(10 ** 9) == 0
+
+
+def test_backoff_grows_exponentially_up_to_the_cap(clock, monkeypatch):
+    monkeypatch.setattr(llm_router, "LLM_BACKOFF_BASE_SECONDS", 2)
+    monkeypatch.setattr(llm_router, "LLM_BACKOFF_MAX_SECONDS", 10)
+    backend = _backend("a", FakeClient())
+    assert [backend.back_off(None) for _ in range(4)] == [2, 4, 8, 10]
+    assert backend.back_off(3.0) == 3.0
+    assert backend.cooldown_remaining() == 3.0
+
+
+def test_primary_answers_when_healthy():
+    primary, secondary = FakeClient(), FakeClient()
+    router = LLMRouter([_backend("a", primary), _backend("b", secondary)])
+    routed = _complete(router)
+    assert (routed.backend.name, routed.primary) == ("a", True)
+    assert (primary.calls, secondary.calls) == (1, 0)
+
+
+def test_429_backs_off_the_primary_and_fails_over():
+    primary, secondary = FakeClient(error=APIError(429, retry_after="7")), FakeClient()
+    router = LLMRouter([_backend("a", primary), _backend("b", secondary)])
+    routed = _complete(router)
+    assert (routed.backend.name, routed.primary) == ("b", False)
+    a = router.backends[0]
+    assert a.rate_limited == 1
+    assert 6 < a.cooldown_remaining() <= 7
+
+    # Em backoff, o principal nem é chamado.
+    _complete(router)
+    assert (primary.calls, secondary.calls) == (1, 2)
+
+
+def test_request_errors_are_not_retried_elsewhere():
+    primary, secondary = FakeClient(error=APIError(400)), FakeClient()
+    router = LLMRouter([_backend("a", primary), _backend("b", secondary)])
+    with pytest.raises(APIError):
+        _complete(router)
+    assert secondary.calls == 0
+    assert router.backends[0].cooldown_remaining() == 0
+
+
+@pytest.mark.parametrize("error, status", [(ConnectionError("fora"), 503), (APIError(429), 429)])
+def test_all_backends_failing_returns_retry_after(error, status):
+    router = LLMRouter([_backend("a", FakeClient(error=error)), _backend("b", FakeClient(error=error))])
+    with pytest.raises(HTTPException) as raised:
+        _complete(router)
+    assert raised.value.status_code == status
+    assert int(raised.value.headers["Retry-After"]) >= 1
+    assert all(b.failures == 1 and b.cooldown_remaining() > 0 for b in router.backends)
+
+
+def test_token_budget_is_adjusted_by_actual_usage():
+    client = FakeClient(total_tokens=100)
+    router = LLMRouter([_backend("a", client, tokens_per_minute=1000)])
+    _complete(router)
+    assert router.backends[0].tokens.snapshot() == pytest.approx(900, abs=1)
+
+
+def _hedged_router(primary, secondary, samples=30):
+    router = LLMRouter([_backend("a", primary), _backend("b", secondary)], hedge_percentile=50)
+    router.backends[0]._latencies.extend([0.01] * samples)
+    return router
+
+
+def test_hedge_wins_when_primary_is_slow():
+    primary, secondary = FakeClient(delay=1.0), FakeClient()
+    router = _hedged_router(primary, secondary)
+    routed = _complete(router)
+    assert (routed.backend.name, routed.primary) == ("b", False)
+    assert (router.hedges, router.hedge_wins) == (1, 1)
+    # A cópia perdedora é cancelada e não conta como falha do backend.
+    assert primary.cancelled == 1
+    assert router.backends[0].failures == 0
+    assert router.backends[0].cooldown_remaining() == 0
+
+
+def test_primary_can_still_win_after_hedging():
+    primary, secondary = FakeClient(delay=0.05), FakeClient(delay=1.0)
+    router = _hedged_router(primary, secondary)
+    routed = _complete(router)
+    assert routed.backend.name == "a"
+    assert (router.hedges, router.hedge_wins) == (1, 0)
+    assert secondary.cancelled == 1
+
+
+def test_hedge_failures_back_off_each_backend_once():
+    slow_failure = FakeClient(delay=0.2, error=ConnectionError())
+    fast_failure = FakeClient(delay=0.05, error=ConnectionError())
+    healthy = FakeClient()
+    router = LLMRouter([_backend("a", slow_failure), _backend("b", fast_failure), _backend("c", healthy)],
+                       hedge_percentile=50)
+    router.backends[0]._latencies.extend([0.01] * 30)
+    routed = _complete(router)
+    assert routed.backend.name == "c"
+    a, b, _ = router.backends
+    assert (a.failures, a.consecutive_failures) == (1, 1)
+    assert (b.failures, b.consecutive_failures) == (1, 1)
+    assert a.cooldown_remaining() > 0 and b.cooldown_remaining() > 0
+
+
+def test_no_hedge_without_enough_latency_samples():
+    primary, secondary = FakeClient(delay=0.05), FakeClient()
+    router = _hedged_router(primary, secondary, samples=llm_router.LLM_HEDGE_MIN_SAMPLES - 1)
+    assert _complete(router).backend.name == "a"
+    assert router.hedges == 0
+    assert secondary.calls == 0
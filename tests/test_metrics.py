@@ -0,0 +1,87 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.utils import metrics
+from src.utils.metrics import Counter, Gauge, Histogram, MetricsMiddleware, Registry, timed
+
+
+def _lines(registry: Registry):
+    return registry.render().splitlines()
+
+
+def test_counter_type_line_uses_the_sample_name():
+    registry = Registry()
+    counter = registry.register(Counter("pedidos", "Pedidos.", ("rota",)))
+    counter.inc(rota="/a")
+    counter.inc(2, rota="/a")
+    assert _lines(registry) == [
+        "# HELP pedidos_total Pedidos.",
+        "# TYPE pedidos_total counter",
+        'pedidos_total{rota="/a"} 3',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.register(Histogram("duracao", "Duração.", ("etapa",), buckets=(0.1, 1.0)))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, etapa="llm")
+    assert _lines(registry)[2:] == [
+        'duracao_bucket{etapa="llm",le="0.1"} 2',
+        'duracao_bucket{etapa="llm",le="1"} 3',
+        'duracao_bucket{etapa="llm",le="+Inf"} 4',
+        'duracao_sum{etapa="llm"} 3.65',
+        'duracao_count{etapa="llm"} 4',
+    ]
+
+
+def test_gauge_and_label_escaping():
+    registry = Registry()
+    gauge = registry.register(Gauge("fila", "Fila.", ("nome",)))
+    gauge.inc(3, nome='a"b\\c\nd')
+    gauge.dec(1, nome='a"b\\c\nd')
+    assert _lines(registry)[-1] == 'fila{nome="a\\"b\\\\c\\nd"} 2'
+
+
+def test_collectors_and_constant_labels():
+    registry = Registry()
+    registry.add_collector(lambda: [("cache_hits", "counter", "Acertos.", [("cache_hits_total", {}, 5)])])
+    registry.set_constant_labels(worker=1)
+    assert _lines(registry) == [
+        "# HELP cache_hits_total Acertos.",
+        "# TYPE cache_hits_total counter",
+        'cache_hits_total{worker="1"} 5',
+    ]
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/itens/{item}")
+    def item(item: str):
+        with timed("consulta"):
+            pass
+        return {"item": item}
+
+    return TestClient(app)
+
+
+def test_middleware_records_route_template_and_server_timing(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TIMING_HEADER", "request")
+    client = _app()
+    assert "server-timing" not in client.get("/itens/1").headers
+    header = client.get("/itens/2", headers={"X-Debug-Timing": "1"}).headers["server-timing"]
+    assert header.startswith("consulta;dur=")
+    assert ", total;dur=" in header
+
+    rendered = metrics.registry.render()
+    assert 'curadoria_request_seconds_count{method="GET",route="/itens/{item}",status="200"}' in rendered
+    assert 'curadoria_stage_seconds_count{stage="consulta"}' in rendered
+
+
+@pytest.mark.parametrize("mode, expected", [("always", True), ("off", False)])
+def test_timing_header_modes(monkeypatch, mode, expected):
+    monkeypatch.setattr(metrics, "METRICS_TIMING_HEADER", mode)
+    response = _app().get("/itens/1", headers={"X-Debug-Timing": "1"})
+    assert ("server-timing" in response.headers) is expected
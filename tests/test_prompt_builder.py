@@ -0,0 +1,88 @@
+from src.utils.prompt_builder import (CATEGORIZACAO_WEIGHTS, CHARS_PER_TOKEN, DEFAULT_RULE, categorizacao_document_text,
+                                      compiled_system_prompt, detect_sections, estimate_tokens, header_weights,
+                                      select_passages)
+
+
+def _section(title: str, topic: str, sentences: int = 30) -> str:
+    return f"{title} " + " ".join(f"Sentence {i} about {topic} in this study." for i in range(sentences))
+
+
+ARTICLE = " ".join([
+    "Zinc fertilizers for citrus orchards. Authors A. Silva and B. Souza, Journal of Soils 2023.",
+    _section("ABSTRACT", "the main findings"),
+    _section("1. INTRODUCTION", "previous work"),
+    _section("2. MATERIALS AND METHODS", "the experimental design"),
+    _section("3. RESULTS AND DISCUSSION", "zinc uptake"),
+    _section("4. CONCLUSIONS", "the recommendations", 5),
+    _section("REFERENCES", "cited papers", 60),
+])
+
+
+def _sections_in(output: str):
+    return [line.split("]")[0][1:] for line in output.split("\n") if line.startswith("[")]
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a") == 1
+    assert estimate_tokens("a" * CHARS_PER_TOKEN) == 1
+    assert estimate_tokens("a" * (CHARS_PER_TOKEN + 1)) == 2
+
+
+def test_detect_sections_needs_a_capitalized_word_after_the_title():
+    text = "Title of the paper. ABSTRACT This study... Results show that yield grew. RESULTS The yield grew."
+    assert [name for _, name in detect_sections(text)] == ["front", "abstract", "results"]
+
+
+def test_text_within_budget_is_returned_whole():
+    text = "Short text. " * 10
+    assert select_passages(text, {"abstract": 1.0}, (), token_budget=len(text)) == text
+
+
+def test_selection_respects_the_budget_and_document_order():
+    budget = 600
+    output = select_passages(ARTICLE, {"front": 1.0, "abstract": 2.0, "results": 1.5}, (), budget)
+    assert len(output) <= budget * CHARS_PER_TOKEN
+    sections = _sections_in(output)
+    assert sections[0] == "FRONT"
+    assert sections == sorted(sections, key=["FRONT", "ABSTRACT", "RESULTS"].index)
+    assert "REFERENCES" not in sections
+    assert "cited papers" not in output
+
+
+def test_heavy_section_does_not_take_the_whole_budget():
+    # Métodos longo o bastante para ocupar sozinho o orçamento inteiro.
+    text = " ".join(["Zinc fertilizers for citrus orchards.", _section("ABSTRACT", "the main findings"),
+                     _section("MATERIALS AND METHODS", "the experimental design", 120)])
+    output = select_passages(text, {"methods": 3.0, "abstract": 1.0, "front": 1.0}, (), token_budget=800)
+    assert set(_sections_in(output)) == {"FRONT", "ABSTRACT", "METHODS"}
+
+
+def test_terms_favor_matching_passages():
+    text = "Title. " + _section("RESULTS", "yield") + " " + " ".join(
+        f"Sentence {i} about zinc uptake in leaves." for i in range(5))
+    output = select_passages(text, {"results": 1.0}, ("zinc",), token_budget=60)
+    assert "zinc uptake" in output
+
+
+def test_categorization_focuses_on_front_and_abstract():
+    output = categorizacao_document_text(ARTICLE, token_budget=300)
+    assert set(_sections_in(output)) <= set(s.upper() for s in CATEGORIZACAO_WEIGHTS)
+    assert "FRONT" in _sections_in(output) and "ABSTRACT" in _sections_in(output)
+
+
+def test_header_weights_match_rules_and_fall_back_to_default():
+    weights, terms = header_weights(("Título",))
+    assert weights["front"] == 3.0 ** 0.5
+    assert terms == ()
+    weights, _ = header_weights(("coluna desconhecida",))
+    assert weights == {section: weight ** 0.5 for section, weight in DEFAULT_RULE[0].items()}
+    _, terms = header_weights(("nutrientes (seleção)", "estratégias de fornecimento de nutrientes (seleção)"))
+    assert len(terms) == len(set(terms))
+
+
+def test_system_prompt_drops_instructions_for_missing_columns():
+    prompt = compiled_system_prompt("solos", ("Subtítulo",))
+    assert "**Subtítulo:**" in prompt
+    assert "**nutrientes (seleção):**" not in prompt
+    assert '"Subt\\u00edtulo": ""' in prompt
@@ -0,0 +1,107 @@
+import pytest
+from src.utils import result_cache
+from src.utils.result_cache import ResultCache, normalize_headers, result_key
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache.time, "time", clock)
+    return clock
+
+
+def test_normalize_headers_strips_dedups_and_sorts():
+    assert normalize_headers([" Solo ", "Cultura", "solo", "", "  ", "Cultura"]) == ["Cultura", "Solo", "solo"]
+
+
+def test_result_key_ignores_header_order_and_whitespace():
+    a = result_key("curadoria", "abc", "solos", ["pH", " Cultura"], "modelo", "v1")
+    b = result_key("curadoria", "abc", "solos", ["Cultura", "pH", "pH "], "modelo", "v1")
+    assert a == b
+
+
+@pytest.mark.parametrize("changed", [
+    {"endpoint": "categorize"},
+    {"document_hash": "outro"},
+    {"category": "citros e cana"},
+    {"headers": ["pH", "Cultura", "Local"]},
+    {"model": "outro-modelo"},
+    {"prompt_version": "v2"},
+])
+def test_result_key_changes_with_each_component(changed):
+    base = {"endpoint": "curadoria", "document_hash": "abc", "category": "solos",
+            "headers": ["pH", "Cultura"], "model": "modelo", "prompt_version": "v1"}
+    assert result_key(**base) != result_key(**{**base, **changed})
+
+
+def test_result_key_treats_missing_category_as_empty():
+    assert result_key("categorize", "abc", None, [], "m", "v1") == result_key("categorize", "abc", "", [], "m", "v1")
+
+
+def test_get_returns_stored_value(tmp_path, clock):
+    cache = ResultCache(str(tmp_path / "results.db"), ttl=60)
+    cache.put("k", {"category": "solos"}, "categorize", "m", "v1")
+    assert cache.get("k") == {"category": "solos"}
+    assert cache.get("outra") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_expired_entry_is_removed_on_read(tmp_path, clock):
+    cache = ResultCache(str(tmp_path / "results.db"), ttl=60)
+    cache.put("k", {"category": "solos"}, "categorize", "m", "v1")
+    clock.now += 61
+    assert cache.get("k") is None
+    stats = cache.stats()
+    assert stats["expired"] == 1
+    assert stats["entries"] == 0
+
+
+def test_eviction_drops_expired_then_least_recently_accessed(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(result_cache, "EVICT_EVERY_PUTS", 1)
+    value = {"texto": "x" * 100}
+    entry_size = len(result_cache.json.dumps(value).encode("utf-8"))
+    cache = ResultCache(str(tmp_path / "results.db"), ttl=60, max_bytes=2 * entry_size)
+
+    cache.put("velha", value, "curadoria", "m", "v1")
+    clock.now += 61  # 'velha' expira e sai na próxima gravação
+    cache.put("a", value, "curadoria", "m", "v1")
+    clock.now += 1
+    cache.put("b", value, "curadoria", "m", "v1")
+    clock.now += 1
+    cache.get("a")  # 'a' passa a ser a mais recente
+    clock.now += 1
+    cache.put("c", value, "curadoria", "m", "v1")
+
+    assert cache.get("velha") is None
+    assert cache.get("b") is None
+    assert cache.get("a") == value
+    assert cache.get("c") == value
+    stats = cache.stats()
+    assert stats["expired"] == 1
+    assert stats["evictions"] == 1
+    assert stats["size_bytes"] <= cache.max_bytes
+
+
+def test_invalidate_keeps_only_current_prompt_version(tmp_path, clock):
+    cache = ResultCache(str(tmp_path / "results.db"))
+    cache.put("antiga", {"v": 1}, "curadoria", "m", "v1")
+    cache.put("atual", {"v": 2}, "curadoria", "m", "v2")
+    assert cache.invalidate("v2", keep_current=True) == 1
+    assert cache.get("antiga") is None
+    assert cache.get("atual") == {"v": 2}
+
+
+def test_disabled_cache_is_a_no_op():
+    cache = ResultCache(None)
+    cache.put("k", {"v": 1}, "curadoria", "m", "v1")
+    assert not cache.enabled
+    assert cache.get("k") is None
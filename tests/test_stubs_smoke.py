@@ -0,0 +1,87 @@
+"""Smoke test do app contra os stubs de benchmarks/stubs.py, tudo no mesmo processo."""
+import json
+import importlib
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from benchmarks.stubs import build_llm_app, build_vector_app
+from src.utils.startup import LazyResource
+
+TEXT = ("Zinc fertilizers for citrus orchards. ABSTRACT Foliar zinc application increased fruit yield "
+        "in sweet orange trees grown on an Oxisol in São Paulo, Brazil. ") * 3
+
+
+@pytest.fixture(scope="module")
+def llm(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("app")
+    with pytest.MonkeyPatch.context() as mp:
+        # llm.log e os caches com caminho relativo vão para o diretório temporário.
+        mp.chdir(workdir)
+        mp.setenv("GROQ_API_KEY", "stub")
+        mp.setenv("LLM_BACKENDS", "groq")
+        mp.setenv("VECTOR_BACKEND", "local")
+        mp.setenv("VECTOR_INDEX_DIR", str(workdir / "vector_index"))
+        mp.setenv("CLASSIFIER_PATH", str(workdir / "sem-classificador.json"))
+        mp.setenv("EXTRACTION_POOL", "thread")
+        module = importlib.import_module("src.utils.llm")
+
+        def stub_client():
+            from groq import AsyncGroq
+            transport = httpx.ASGITransport(app=build_llm_app(latency_ms=0, jitter_ms=0, error_rate=0))
+            return AsyncGroq(api_key="stub", base_url="http://stub-llm", max_retries=0,
+                             http_client=httpx.AsyncClient(transport=transport))
+
+        mp.setattr(module.llm_router.primary, "client", LazyResource("groq", stub_client))
+        mp.setattr(module, "result_cache", module.ResultCache(str(workdir / "results.db")))
+        mp.setattr(module, "dedup_index", module.DuplicateIndex(str(workdir / "dedup.db")))
+        yield module
+
+
+def test_categorize_upload_goes_through_the_llm_stub(llm):
+    with TestClient(llm.app) as client:
+        assert client.get("/health/live").json()["status"] == "alive"
+        response = client.post("/categorize/upload?content_type=text", content=TEXT.encode(),
+                               headers={"Content-Type": "text/plain"})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert body["category"] in ("solos", "citros e cana")
+        assert (body["source"], body["backend"]) == ("llm", "groq")
+
+        # A mesma resposta volta do cache sem nova chamada à LLM.
+        calls = llm.llm_router.primary.calls
+        assert client.post("/categorize/upload?content_type=text", content=TEXT.encode(),
+                           headers={"Content-Type": "text/plain"}).json() == body
+        assert llm.llm_router.primary.calls == calls
+
+        metrics = client.get("/metrics").text
+        assert 'curadoria_llm_calls_total{endpoint="categorize",outcome="ok"} 1' in metrics
+        assert client.get("/llm/stats").json()["backends"]["groq"]["successes"] == 1
+
+
+def test_llm_stub_returns_429_with_retry_after():
+    client = TestClient(build_llm_app(latency_ms=0, jitter_ms=0, error_rate=1.0))
+    response = client.post("/v1/chat/completions", json={"messages": [{"role": "user", "content": "oi"}]})
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    assert client.get("/stats").json() == {"requests": 1, "errors": 1}
+
+
+def test_llm_stub_fills_the_curadoria_schema():
+    client = TestClient(build_llm_app(latency_ms=0, jitter_ms=0, error_rate=0))
+    system = 'Responda no esquema:\n{"Título": "", "Autor": ""}'
+    response = client.post("/openai/v1/chat/completions", json={
+        "model": "m", "response_format": {"type": "json_object"},
+        "messages": [{"role": "system", "content": system}, {"role": "user", "content": "texto"}],
+    })
+    content = response.json()["choices"][0]["message"]["content"]
+    assert {"Título", "Autor", "APROVAÇÃO CURADOR (marcar)"} <= set(json.loads(content))
+
+
+def test_vector_stub_returns_nearest_points_in_order():
+    client = TestClient(build_vector_app(points=50, latency_ms=0))
+    response = client.post("/collections/BaseCurador/points/query",
+                           json={"query": {"nearest": [1.0, 0.0, 0.0, 0.0]}, "limit": 5})
+    points = response.json()["result"]["points"]
+    assert len(points) == 5
+    assert [p["score"] for p in points] == sorted((p["score"] for p in points), reverse=True)
+    assert all(p["payload"]["text"].startswith("Fato científico") for p in points)
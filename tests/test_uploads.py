@@ -0,0 +1,111 @@
+import os
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from src.utils import uploads
+from src.utils.text_cache import content_hash
+from src.utils.uploads import read_upload_request
+
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_TMP_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def client(spool_dir):
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        received = await read_upload_request(request)
+        with open(received.upload.path, "rb") as f:
+            data = f.read()
+        received.upload.cleanup()
+        return {
+            "content_type": received.upload.content_type,
+            "key_matches": received.upload.key == content_hash(data, received.upload.content_type),
+            "size": len(data),
+            "headers": received.headers,
+            "category": received.category,
+            "cache_mode": received.cache_mode,
+        }
+
+    return TestClient(app)
+
+
+def _multipart(*parts, boundary="XX"):
+    """Corpo multipart montado à mão, para controlar a ordem dos campos."""
+    body = b""
+    for name, value, extra in parts:
+        body += f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"{extra}\r\n\r\n'.encode() + value + b"\r\n"
+    return body + f"--{boundary}--\r\n".encode(), {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def test_multipart_file_and_fields(client, spool_dir):
+    data = os.urandom(3 * uploads.UPLOAD_CHUNK_SIZE + 17)
+    response = client.post("/upload", files={"file": ("a.pdf", data, "application/pdf")},
+                           data={"headers": ["Título", "Autor"], "category": "solos", "cache_mode": "refresh"})
+    assert response.json() == {"content_type": "pdf", "key_matches": True, "size": len(data),
+                               "headers": ["Título", "Autor"], "category": "solos", "cache_mode": "refresh"}
+    assert os.listdir(spool_dir) == []
+
+
+def test_multipart_infers_text_from_the_part_content_type(client):
+    response = client.post("/upload", files={"file": ("a.txt", b"texto", "text/plain")},
+                           data={"headers": '["A", "B"]'})
+    assert response.json()["content_type"] == "text"
+    assert response.json()["headers"] == ["A", "B"]
+
+
+def test_content_type_sent_after_the_file_rehashes(client):
+    body, headers = _multipart(("file", b"ola mundo", '; filename="a.bin"'), ("content_type", b"text", ""))
+    response = client.post("/upload", content=body, headers=headers)
+    assert response.json()["content_type"] == "text"
+    assert response.json()["key_matches"] is True
+
+
+@pytest.mark.parametrize("files, data, status", [
+    ({"file": ("a.pdf", b"%PDF", "application/pdf")}, {"content_type": "docx"}, 400),
+    ({"file": ("a.pdf", b"%PDF", "application/pdf")}, {"cache_mode": "sempre"}, 400),
+    ({"file": ("a.pdf", b"%PDF", "application/pdf")}, {"headers": "[não é json"}, 400),
+    ({"file": ("a.pdf", b"", "application/pdf")}, {}, 400),
+    ({"outro": ("a.pdf", b"%PDF", "application/pdf")}, {}, 400),
+])
+def test_multipart_validation_errors(client, spool_dir, files, data, status):
+    assert client.post("/upload", files=files, data=data).status_code == status
+    assert os.listdir(spool_dir) == []
+
+
+def test_duplicate_file_part_is_rejected(client, spool_dir):
+    body, headers = _multipart(("file", b"a", '; filename="a.pdf"'), ("file", b"b", '; filename="b.pdf"'))
+    assert client.post("/upload", content=body, headers=headers).status_code == 400
+    assert os.listdir(spool_dir) == []
+
+
+def test_oversized_file_and_field_are_rejected(client, spool_dir, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_MAX_BYTES", 10)
+    response = client.post("/upload", files={"file": ("a.pdf", b"x" * 11, "application/pdf")})
+    assert response.status_code == 413
+    response = client.post("/upload", files={"file": ("a.pdf", b"x", "application/pdf")},
+                           data={"category": "x" * (uploads.UPLOAD_MAX_FIELD_BYTES + 1)})
+    assert response.status_code == 413
+    assert os.listdir(spool_dir) == []
+
+
+def test_multipart_without_boundary(client):
+    response = client.post("/upload", content=b"abc", headers={"Content-Type": "multipart/form-data"})
+    assert response.status_code == 400
+
+
+def test_raw_body_with_query_options(client):
+    response = client.post("/upload?content_type=text&headers=h1&headers=h2&category=solos", content=b"abc",
+                           headers={"Content-Type": "application/octet-stream"})
+    assert response.json() == {"content_type": "text", "key_matches": True, "size": 3, "headers": ["h1", "h2"],
+                               "category": "solos", "cache_mode": "use"}
+
+
+@pytest.mark.parametrize("media_type, status", [("application/json", 415), ("application/pdf", 200)])
+def test_raw_body_media_types(client, media_type, status):
+    assert client.post("/upload", content=b"%PDF", headers={"Content-Type": media_type}).status_code == status